@@ -0,0 +1,83 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+
+class AppListIndex:
+    # the ~250k applist entries as parallel sorted arrays instead of a dict per app:
+    # titles sorted by casefolded title for prefix ranges, plus appids sorted with a position back into the titles.
+    # prefixes matching more than scan_limit titles get their best max_limit ranked at load time, so a lookup
+    # never ranks more than scan_limit entries
+
+    def __init__(self, apps: Iterable[tuple[int, str]] = (), max_limit: int = 50, scan_limit: int = 256):
+        self.max_limit = max_limit
+        self.scan_limit = scan_limit
+        self.version = None # the published applist version this was loaded from
+        self.load(apps)
+
+    def load(self, apps: Iterable[tuple[int, str]], version: int | None = None):
+        entries = sorted((name.casefold(), name, appid) for appid, name in apps if name)
+        keys = [key for key, _, _ in entries]
+        names = [name for _, name, _ in entries]
+        appids = array('q', (appid for _, _, appid in entries))
+
+        by_appid = sorted(range(len(appids)), key=appids.__getitem__)
+        sorted_appids = array('q', (appids[position] for position in by_appid))
+        positions = array('q', by_appid)
+
+        # swap everything in one assignment so readers never see half an index
+        self._state = (keys, names, appids, sorted_appids, positions, self._rank_large_prefixes(keys))
+        self.version = version
+
+    def _rank_large_prefixes(self, keys: list[str]) -> dict[str, list[int]]:
+        # shortest title first, it's the closest to what was typed. keys are sorted, so a stable sort by length
+        # breaks ties alphabetically
+        rank = array('q', bytes(8 * len(keys)))
+        for order, position in enumerate(sorted(range(len(keys)), key=lambda position: len(keys[position]))):
+            rank[position] = order
+
+        # one level per prefix length, only the groups still too big to scan go on to the next level
+        ranked = {}
+        groups = [(0, len(keys))]
+        depth = 1
+        while groups:
+            children = []
+            for start, end in groups:
+                index = start
+                while index < end:
+                    if len(keys[index]) < depth:
+                        index += 1 # a title this short only matches prefixes the previous level already ranked
+                        continue
+                    prefix = keys[index][:depth]
+                    group_end = bisect_left(keys, prefix + '\U0010ffff', lo=index, hi=end)
+                    if group_end - index > self.scan_limit:
+                        ranked[prefix] = heapq.nsmallest(self.max_limit, range(index, group_end), key=rank.__getitem__)
+                        children.append((index, group_end))
+                    index = group_end
+            groups = children
+            depth += 1
+        return ranked
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def title(self, appid: int) -> str | None:
+        _, names, _, sorted_appids, positions, _ = self._state
+        index = bisect_left(sorted_appids, appid)
+        if index < len(sorted_appids) and sorted_appids[index] == appid:
+            return names[positions[index]]
+        return None
+
+    def prefix(self, prefix: str, limit: int = 10) -> list[tuple[int, str]]:
+        keys, names, appids, _, _, ranked = self._state
+        prefix = prefix.casefold()
+        if limit <= self.max_limit and prefix in ranked:
+            best = ranked[prefix][:limit]
+        else:
+            start = bisect_left(keys, prefix)
+            end = bisect_left(keys, prefix + '\U0010ffff', lo=start)
+            best = heapq.nsmallest(limit, range(start, end), key=lambda position: (len(keys[position]), keys[position]))
+        return [(appids[position], names[position]) for position in best]
+
+applist_index = AppListIndex()
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+from .stub_steam import StubSteam
+from .synthetic import FEATURES, STUDIOS, TAGS, WORDS, synthetic_game
+
+# offline end to end numbers: the api runs in-process against a local mongod and a stub steam,
+# every scenario reports latency percentiles and throughput, --json writes them for comparing runs
+
+
+def seed(db, games: int, chart: list[int], chunk_size: int = 10_000):
+    from mongo_db_processor import price_fields, DBEnums
+
+    db.client.drop_database(db.name)
+    for start in range(1, games + 1, chunk_size):
+        batch = [synthetic_game(appid) for appid in range(start, min(start + chunk_size, games + 1))]
+        for game in batch:
+            game.update(price_fields(game['editions']))
+        db.steam_apps.insert_many(batch, ordered=False)
+        db.applist.insert_many([{'appid': game['appid'], 'name': game['title']} for game in batch], ordered=False)
+
+    # a fresh published snapshot, so the top games scenarios never trigger a chart refresh
+    db.top_games.insert_many([{'appid': appid, 'title': synthetic_game(appid)['title'], 'version': 1, 'rank': rank}
+                              for rank, appid in enumerate(chart)])
+    db.app_metadata.insert_one({'operation': DBEnums.LAST_TOP_GAMES_UPDATE, 'version': 1, 'last_update': datetime.now()})
+
+
+def _summary(latencies: list[float], wall: float, concurrency: int) -> dict:
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p50_ms': round(percentiles[49] * 1000, 3),
+        'p90_ms': round(percentiles[89] * 1000, 3),
+        'p99_ms': round(percentiles[98] * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / wall, 1)
+    }
+
+
+async def measure(client: httpx.AsyncClient,
+                  make_request: Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]],
+                  requests: int,
+                  concurrency: int,
+                  before: Callable[[], None] | None = None) -> dict:
+    latencies = []
+    remaining = iter(range(requests))
+    rng = random.Random(0)
+
+    async def _worker():
+        for _ in remaining:
+            if before:
+                before()
+            start = time.perf_counter()
+            response = await make_request(client, rng)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise AssertionError(f'{response.request.url} answered {response.status_code}: {response.text[:200]}')
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    return _summary(latencies, time.perf_counter() - wall_start, concurrency)
+
+
+def search_scenarios(games: int) -> dict[str, Callable]:
+    def _search(params: Callable[[random.Random], dict]):
+        return lambda client, rng: client.get('/games/search', params=params(rng))
+
+    def _price_range(rng: random.Random) -> dict:
+        low = rng.choice([0, 5, 10, 20])
+        return {'edition_min': low, 'edition_max': low + rng.choice([5, 10, 30])}
+
+    return {
+        'search appid': _search(lambda rng: {'appid': rng.randint(1, games)}),
+        'search title': _search(lambda rng: {'title': rng.choice(WORDS)}),
+        'search description': _search(lambda rng: {'description': rng.choice(WORDS)}),
+        'search release_date': _search(lambda rng: {'release_date': synthetic_game(rng.randint(1, games))['release_date'].isoformat()}),
+        'search developers': _search(lambda rng: {'developers': [rng.choice(STUDIOS)]}),
+        'search publishers': _search(lambda rng: {'publishers': [rng.choice(STUDIOS)]}),
+        'search tags': _search(lambda rng: {'tags': rng.sample(TAGS, 2)}),
+        'search features': _search(lambda rng: {'features': [rng.choice(FEATURES)]}),
+        'search edition_min': _search(lambda rng: {'edition_min': rng.choice([10, 20, 40])}),
+        'search edition_max': _search(lambda rng: {'edition_max': rng.choice([5, 10, 20])}),
+        'search price range': _search(_price_range),
+        'search text': lambda client, rng: client.get('/games/search/text', params={'q': ' '.join(rng.sample(WORDS, 2))}),
+    }
+
+
+async def bench_api(api, db, games: int, requests: int, concurrency: int, chart: list[int]) -> dict:
+    results = {}
+    transport = httpx.ASGITransport(app=api.app, client=('10.0.0.1', 4000))
+
+    async with api.lifespan(api.app), httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def run(name: str, make_request, count: int = requests, workers: int = concurrency, before=None):
+            results[name] = await measure(client, make_request, count, workers, before)
+            print(f"{name:<28} p50 {results[name]['p50_ms']:>9} ms  p99 {results[name]['p99_ms']:>9} ms  "
+                  f"{results[name]['throughput_rps']:>9} req/s", flush=True)
+
+        await run('games page', lambda client, rng: client.get('/games', params={'limit': 100, 'after': rng.randint(0, games)}))
+        await run('games stream (full export)', lambda client, rng: client.get('/games', params={'stream': True}), count=1, workers=1)
+
+        # every search scenario with an empty result cache, so mongo does the work every time
+        for name, make_request in search_scenarios(games).items():
+            await run(name, make_request, before=api.search_cache.invalidate)
+        await run('search tags (cached)', lambda client, rng: client.get('/games/search', params={'tags': ['FPS']}))
+
+        await run('top_games_info warm', lambda client, rng: client.get('/games/top_games_info', params={'num_games': 99}))
+        # cold: the chart games aren't stored yet, each request scrapes all of them from the stub. the raw delete
+        # doesn't go through the repository, invalidate so top_games_metadata drops what it holds in memory too
+        def cold_reset():
+            db.steam_apps.delete_many({'appid': {'$in': chart}})
+            api.search_cache.invalidate()
+        await run('top_games_info cold', lambda client, rng: client.get('/games/top_games_info', params={'num_games': 99}),
+                  count=3, workers=1, before=cold_reset)
+
+    return results
+
+
+async def bench_limiter(requests: int = 200_000, clients: int = 10_000) -> dict:
+    from middleware import RequestLimiter
+
+    async def endpoint(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        pass
+
+    scopes = [{'type': 'http', 'client': (f'10.{n // 65536}.{n // 256 % 256}.{n % 256}', 4000)} for n in range(clients)]
+
+    async def _timed(app) -> float:
+        start = time.perf_counter()
+        for n in range(requests):
+            await app(scopes[n % clients], receive, send)
+        return time.perf_counter() - start
+
+    bare = await _timed(endpoint)
+    results = {}
+    for name, limiter in {
+        'limiter': RequestLimiter(endpoint, max_calls=10 ** 9),
+        'limiter evicting (cap below client count)': RequestLimiter(endpoint, max_calls=10 ** 9, max_clients=clients // 10)
+    }.items():
+        wrapped = await _timed(limiter)
+        results[name] = {
+            'requests': requests,
+            'clients': clients,
+            'overhead_us_per_request': round((wrapped - bare) / requests * 1e6, 3),
+            'throughput_rps': round(requests / wrapped, 1),
+            'tracked_clients': len(limiter.backend.call_track)
+        }
+        print(f"{name:<42} +{results[name]['overhead_us_per_request']} us/request", flush=True)
+    return results
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> dict:
+    chart = list(range(1, 100))
+    with StubSteam(catalog=range(1, args.games + 1), chart=chart) as stub:
+        # settings are read at import, point them at the stub and the bench db before the app loads
+        os.environ.update({
+            'STEAM_STORE_URL': stub.url,
+            'STEAM_API_URL': stub.url,
+            'MONGO_URI': args.mongo_uri,
+            'MONGO_DB': args.db,
+            'RATE_LIMIT_MAX_CALLS': str(10 ** 9),
+            'SCRAPE_RATE': str(10 ** 6), # the stub doesn't need pacing, measure the scrape itself
+            'PAGE_CACHE_DIR': '' # cold scenarios should scrape, not read pages back from a previous run
+        })
+        api = importlib.import_module('main')
+        db = importlib.import_module('pymongo').MongoClient(args.mongo_uri)[args.db]
+
+        print(f'seeding {args.games} games into {args.db}', flush=True)
+        seed_start = time.perf_counter()
+        seed(db, args.games, chart)
+        print(f'seeded in {time.perf_counter() - seed_start:.1f}s', flush=True)
+
+        results = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'git_revision': _git_revision(),
+                'python': platform.python_version(),
+                'games': args.games,
+                'requests_per_scenario': args.requests,
+                'concurrency': args.concurrency
+            },
+            'api': await bench_api(api, db, args.games, args.requests, args.concurrency, chart),
+            'rate_limiter': await bench_limiter()
+        }
+        results['meta']['stub_requests'] = stub.requests
+
+    if not args.keep_db:
+        db.client.drop_database(args.db)
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Offline api benchmark against a local mongod and a stub steam')
+    arg_parser.add_argument('--games', type=int, default=10_000, help='size of the synthetic library (10k to 1M)')
+    arg_parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    arg_parser.add_argument('--concurrency', type=int, default=8)
+    arg_parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    arg_parser.add_argument('--db', default='steam_bench', help='dropped and re-seeded, never point it at real data')
+    arg_parser.add_argument('--keep-db', action='store_true')
+    arg_parser.add_argument('--json', type=Path, help='write the results here')
+    args = arg_parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
@@ -0,0 +1,64 @@
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from scrapers.game_page_scraper import PageScraper, parse_game_page
+from .record import record_pages
+from .synthetic import fixture_pages
+
+# the old way: whole page through html.parser, every get_* searching the full tree
+BASELINE = {'parser': 'html.parser', 'parse_only': None}
+ENGINES = {
+    'html.parser full tree': BASELINE,
+    'lxml full tree': {'parser': 'lxml', 'parse_only': None},
+    'html.parser strained': {'parser': 'html.parser', 'parse_only': PageScraper.PARSE_ONLY},
+    'lxml strained (default)': {}
+}
+
+
+def run(rounds: int) -> dict:
+    pages = fixture_pages()
+    results = {'pages': len(pages), 'page_kib': round(statistics.mean(len(html) for html in pages.values()) / 1024), 'engines': {}}
+
+    expected = {appid: parse_game_page(appid, html, **BASELINE) for appid, html in pages.items()}
+
+    for name, options in ENGINES.items():
+        timings = []
+        for _ in range(rounds):
+            for appid, html in pages.items():
+                start = time.perf_counter()
+                game = parse_game_page(appid, html, **options)
+                timings.append(time.perf_counter() - start)
+                if game != expected[appid]:
+                    raise AssertionError(f'{name} extracted something else than the baseline for app {appid}')
+
+        results['engines'][name] = {
+            'mean_ms': round(statistics.mean(timings) * 1000, 2),
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'max_ms': round(max(timings) * 1000, 2),
+        }
+
+    baseline_ms = results['engines']['html.parser full tree']['mean_ms']
+    for engine in results['engines'].values():
+        engine['speedup'] = round(baseline_ms / engine['mean_ms'], 2)
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compare store page parsing engines, output must match the baseline')
+    arg_parser.add_argument('--rounds', type=int, default=5)
+    arg_parser.add_argument('--json', type=Path, help='also write the results here')
+    arg_parser.add_argument('--record', type=int, nargs='+', metavar='APPID', help='save live store pages as fixtures and exit')
+    args = arg_parser.parse_args()
+
+    if args.record:
+        record_pages(args.record)
+    else:
+        results = run(args.rounds)
+        print(f"{results['pages']} pages, {results['page_kib']} KiB on average, output identical for every engine")
+        for name, engine in results['engines'].items():
+            print(f"{name:<26} mean {engine['mean_ms']:>8} ms  p50 {engine['p50_ms']:>8} ms  x{engine['speedup']}")
+        if args.json:
+            args.json.write_text(json.dumps(results, indent=2))
@@ -0,0 +1,81 @@
+import argparse
+import json
+
+import httpx
+
+from settings import STEAM_API_URL, STEAM_STORE_URL
+from .synthetic import FIXTURES_DIR
+
+# saves live steam responses into benchmarks/fixtures, the stub serves them instead of synthetic ones.
+# run it without the STEAM_*_URL overrides, they'd point it at the stub
+
+
+def _save(name: str, body: bytes):
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    (FIXTURES_DIR / name).write_bytes(body)
+    print(f'saved {name} ({len(body) / 1024:.0f} KiB)')
+
+
+def record_pages(appids: list[int]):
+    from scrapers.game_page_scraper import PageScraper
+
+    for appid in appids:
+        resp = httpx.get(PageScraper.STEAM_URL.format(appid=appid), follow_redirects=True, timeout=10)
+        resp.raise_for_status()
+        _save(f'app_{appid}.html', resp.content)
+
+
+def record_top_sellers(num_games: int):
+    # the same request HttpTopSellersSource makes
+    request = {
+        'context': {'language': 'english'},
+        'data_request': {'include_basic_info': True},
+        'page_start': 0,
+        'page_count': num_games + 1
+    }
+    resp = httpx.get(STEAM_API_URL + '/IStoreTopSellersService/GetWeeklyTopSellers/v1/',
+                     params={'input_json': json.dumps(request)}, timeout=10)
+    resp.raise_for_status()
+    _save('top_sellers.json', resp.content)
+
+
+def record_chart(num_games: int):
+    # the rows render client side, a plain GET only gets the react shell. needs chrome, like the browser source
+    from scrapers.top_sellers import BrowserTopSellersSource
+
+    source = BrowserTopSellersSource()
+    try:
+        html = source._get_page_source(num_games)
+    finally:
+        source._pool.close()
+    _save('chart.html', html.encode())
+
+
+def record_applist(limit: int | None):
+    resp = httpx.get(STEAM_API_URL + '/ISteamApps/GetAppList/v2', timeout=30)
+    resp.raise_for_status()
+    if limit is None:
+        _save('applist.json', resp.content)
+        return
+    apps = resp.json()['applist']['apps'][:limit]
+    _save('applist.json', json.dumps({'applist': {'apps': apps}}).encode())
+
+
+if __name__ == '__main__':
+    from scrapers.populate_db import CHART_SIZE
+
+    arg_parser = argparse.ArgumentParser(description='Record live steam responses as benchmark fixtures')
+    arg_parser.add_argument('--apps', type=int, nargs='*', default=[], metavar='APPID', help='store pages to save')
+    arg_parser.add_argument('--top-sellers', action='store_true', help='the weekly top sellers web api response')
+    arg_parser.add_argument('--chart', action='store_true', help='the rendered top sellers chart page')
+    arg_parser.add_argument('--applist', action='store_true', help='the full applist')
+    arg_parser.add_argument('--applist-limit', type=int, help='keep only the first N apps of the applist')
+    args = arg_parser.parse_args()
+
+    record_pages(args.apps)
+    if args.top_sellers:
+        record_top_sellers(CHART_SIZE)
+    if args.chart:
+        record_chart(CHART_SIZE)
+    if args.applist:
+        record_applist(args.applist_limit)
@@ -0,0 +1,108 @@
+import json
+import re
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .synthetic import FIXTURES_DIR, store_page, synthetic_game
+
+# a local stand-in for store.steampowered.com and api.steampowered.com. serves recorded responses from benchmarks/fixtures
+# when they exist (app_<appid>.html, chart.html, top_sellers.json, applist.json), synthetic ones otherwise
+
+
+class StubSteam:
+
+    def __init__(self, catalog: range, chart: list[int] | None = None, host: str = '127.0.0.1', port: int = 0):
+        self.catalog = catalog
+        self.chart = chart or list(catalog[:100])
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @lru_cache(maxsize=1024)
+    def app_page(self, appid: int) -> bytes:
+        recorded = FIXTURES_DIR / f'app_{appid}.html'
+        if recorded.exists():
+            return recorded.read_bytes()
+        return store_page(synthetic_game(appid)).encode()
+
+    def chart_page(self) -> bytes:
+        recorded = FIXTURES_DIR / 'chart.html'
+        if recorded.exists():
+            return recorded.read_bytes()
+        rows = ''.join(
+            f'<a href="{self.url}/app/{appid}/{synthetic_game(appid)["title"].replace(" ", "_")}/">'
+            f'<div class="rank">{rank}</div></a>'
+            for rank, appid in enumerate(self.chart, start=1)
+        )
+        return f'<html><body><div class="charts">{rows}</div></body></html>'.encode()
+
+    def top_sellers(self) -> bytes:
+        recorded = FIXTURES_DIR / 'top_sellers.json'
+        if recorded.exists():
+            return recorded.read_bytes()
+        ranks = [{'rank': rank, 'appid': appid, 'item': {'appid': appid, 'name': synthetic_game(appid)['title']}}
+                 for rank, appid in enumerate(self.chart, start=1)]
+        return json.dumps({'response': {'ranks': ranks}}).encode()
+
+    def applist(self) -> bytes:
+        recorded = FIXTURES_DIR / 'applist.json'
+        if recorded.exists():
+            return recorded.read_bytes()
+        apps = [{'appid': appid, 'name': synthetic_game(appid)['title']} for appid in self.catalog]
+        return json.dumps({'applist': {'apps': apps}}).encode()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b'', content_type: str = 'text/html; charset=utf-8', headers: dict | None = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stub.requests += 1
+                path = self.path.split('?')[0]
+
+                if app := re.match(r'/app/(\d+)', path):
+                    appid = int(app.group(1))
+                    if appid in stub.catalog:
+                        self._send(200, stub.app_page(appid))
+                    else:
+                        self._send(302, headers={'Location': '/'}) # steam bounces unknown apps to the front page
+                elif path == '/':
+                    self._send(200, b'<html><body>store front</body></html>')
+                elif path.startswith('/charts/topselling'):
+                    self._send(200, stub.chart_page())
+                elif path.startswith('/IStoreTopSellersService/GetWeeklyTopSellers'):
+                    self._send(200, stub.top_sellers(), 'application/json')
+                elif path.startswith('/ISteamApps/GetAppList/v2'):
+                    self._send(200, stub.applist(), 'application/json')
+                else:
+                    self._send(404, b'not found')
+
+        return Handler
@@ -0,0 +1,138 @@
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# stand-ins for recorded steam responses, shaped like the real ones (same sections, classes and rough size)
+# so the scrapers and benchmarks run without network. recorded files in benchmarks/fixtures/ win over these
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+TAGS = ['FPS', 'Shooter', 'Multiplayer', 'Competitive', 'Action', 'Team-Based', 'eSports', 'Tactical', 'First-Person',
+        'PvP', 'Online Co-Op', 'Co-op', 'Strategy', 'RPG', 'Open World', 'Indie', 'Simulation', 'Adventure',
+        'Survival', 'Sandbox', 'Puzzle', 'Platformer', 'Roguelike', 'Horror', 'Racing', 'Sports', 'Casual']
+FEATURES = ['Single-player', 'Online PvP', 'Steam Achievements', 'Steam Trading Cards', 'In-App Purchases',
+            'Steam Workshop', 'Stats', 'Remote Play on Phone', 'Remote Play on Tablet', 'Steam Cloud', 'Family Sharing']
+STUDIOS = ['Valve', 'Bethesda', 'CD PROJEKT RED', 'FromSoftware', 'Larian Studios', 'Paradox', 'Ubisoft', 'Capcom',
+           'Re-Logic', 'ConcernedApe', 'Klei Entertainment', 'Devolver Digital', 'SEGA', 'Bandai Namco']
+WORDS = ('tactical shooter strategy world build survive explore craft fight team online story quest battle dungeon '
+         'city space ship racing puzzle horror adventure hero magic sword gun zombie farm island kingdom empire').split()
+
+
+def synthetic_game(appid: int, rng: random.Random | None = None) -> dict:
+    rng = rng or random.Random(appid)
+    title = ' '.join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4)))
+    editions = {title: rng.choice([0.0, 4.99, 9.99, 14.99, 19.99, 29.99, 39.99, 59.99])}
+    if rng.random() < 0.3:
+        editions[f'{title} Deluxe Edition'] = round(editions[title] + 15, 2)
+    return {
+        'appid': appid,
+        'title': title,
+        'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(15, 40))).capitalize() + '.',
+        'release_date': datetime(2005, 1, 1) + timedelta(days=rng.randint(0, 7000)),
+        'developers': {'developer': rng.choice(STUDIOS), 'publisher': rng.choice(STUDIOS)},
+        'tags': rng.sample(TAGS, rng.randint(3, 15)),
+        'editions': editions,
+        'features': rng.sample(FEATURES, rng.randint(1, 8))
+    }
+
+
+def _price_block(price: float) -> str:
+    if price == 0:
+        return '<div class="game_purchase_price price">Free To Play</div><div class="btn_addtocart">Play Game</div>'
+    cents = int(round(price * 100))
+    return (f'<div class="discount_block game_purchase_discount no_discount" data-price-final="{cents}">'
+            f'<div class="discount_prices"><div class="discount_final_price">${price:.2f}</div></div></div>'
+            '<div class="btn_addtocart"><a class="btn_green_steamui btn_medium" href="#"><span>Add to Cart</span></a></div>')
+
+
+def store_page(game: dict, rng: random.Random | None = None) -> str:
+    rng = rng or random.Random(game['appid'])
+    filler = lambda words: ' '.join(rng.choice(WORDS) for _ in range(words))
+
+    purchase_areas = ''.join(
+        '<div class="game_area_purchase_game_wrapper"><div class="game_area_purchase_game">'
+        f'<div class="game_area_purchase_platform"><span class="platform_img win"></span></div>'
+        f'<h2 class="title">{"Play" if price == 0 else "Buy"} {edition}</h2>'
+        f'<div class="game_purchase_action"><div class="game_purchase_action_bg">{_price_block(price)}</div></div>'
+        '</div></div>'
+        for edition, price in game['editions'].items()
+    )
+    reviews = ''.join(
+        f'<div class="review_box"><div class="persona_name"><a href="#">{filler(2)}</a></div>'
+        f'<div class="vote_header"><div class="title">Recommended</div><div class="hours">{rng.randint(1, 3000)} hrs</div></div>'
+        f'<div class="content">{filler(120)}</div><div class="control_block">'
+        + ''.join(f'<span class="btn_small_thin"><span>{label}</span></span>' for label in ('Yes', 'No', 'Funny', 'Award'))
+        + '</div></div>'
+        for _ in range(40)
+    )
+    screenshots = ''.join(
+        f'<div class="highlight_player_item highlight_screenshot"><div class="screenshot_holder">'
+        f'<a class="highlight_screenshot_link" href="https://cdn.example/ss_{n}.jpg"><img src="https://cdn.example/ss_{n}.600x338.jpg"></a>'
+        '</div></div>'
+        for n in range(30)
+    )
+    about = ''.join(f'<h2 class="bb_tag">{filler(3)}</h2><p class="bb_paragraph">{filler(90)}</p>' for _ in range(25))
+    app_config = json.dumps({str(n): {'name': filler(3), 'value': filler(10)} for n in range(1500)})
+    nav = ''.join(f'<a class="menuitem" href="https://store.steampowered.com/{n}">{filler(1)}</a>' for n in range(300))
+
+    return f'''<!DOCTYPE html>
+<html class="responsive" lang="en">
+<head><title>{game["title"]} on Steam</title>
+<script type="text/javascript">var g_rgAppConfig = {app_config};</script>
+<style>{"".join(f".c{n}{{margin:{n}px}}" for n in range(2000))}</style>
+</head>
+<body class="v6 app game_bg responsive_page">
+<div id="global_header"><div class="content">{nav}</div></div>
+<div class="page_content_ctn">
+  <div class="apphub_HomeHeaderContent"><div class="apphub_HeaderStandardTop">
+    <div id="appHubAppName" class="apphub_AppName">{game["title"]}</div>
+  </div></div>
+  <div class="page_content" id="game_highlights">
+    <div class="leftcol">{screenshots}</div>
+    <div class="rightcol">
+      <div class="glance_ctn">
+        <div class="game_header_image_ctn"><img class="game_header_image_full" src="https://cdn.example/header.jpg"></div>
+        <div class="game_description_snippet">
+          {game["description"]}
+        </div>
+        <div class="glance_ctn_responsive_left">
+          <div id="userReviews"><div class="user_reviews_summary_row"><div class="subtitle column">All Reviews:</div>
+            <div class="summary column"><span class="game_review_summary positive">Very Positive</span></div></div></div>
+          <div class="release_date"><div class="subtitle column">Release Date:</div><div class="date">{game["release_date"]:%d %b, %Y}</div></div>
+          <div class="dev_row"><div class="subtitle column">Developer:</div>
+            <div class="summary column" id="developers_list"><a href="#">{game["developers"]["developer"]}</a></div></div>
+          <div class="dev_row"><div class="subtitle column">Publisher:</div>
+            <div class="summary column"><a href="#">{game["developers"]["publisher"]}</a></div></div>
+        </div>
+        <div class="glance_ctn_responsive_right"><div class="glance_tags_ctn popular_tags_ctn"><div class="glance_tags popular_tags">
+          {"".join(f'<a href="#" class="app_tag">{chr(10)}{tag}{chr(10)}</a>' for tag in game["tags"])}
+        </div></div></div>
+      </div>
+    </div>
+  </div>
+  <div class="page_content">
+    <div class="leftcol game_description_column">
+      <div id="game_area_purchase" class="game_area_purchase">{purchase_areas}</div>
+      <div id="game_area_description" class="game_area_description">{about}</div>
+      <div id="app_reviews_hash" class="app_reviews_area">{reviews}</div>
+    </div>
+    <div class="rightcol game_meta_data">
+      <div class="block responsive_apppage_details_right"><div class="game_area_features_list_ctn">
+        {"".join(f'<a class="game_area_details_specs_ctn" href="#"><div class="icon"></div><div class="label">{feature}</div></a>' for feature in game["features"])}
+      </div></div>
+    </div>
+  </div>
+</div>
+<div id="footer"><div class="footer_content">{filler(400)}</div></div>
+</body>
+</html>'''
+
+
+def fixture_pages(count: int = 5) -> dict[int, str]:
+    # recorded pages named app_<appid>.html if there are any, synthetic ones otherwise
+    recorded = {int(path.stem.removeprefix('app_')): path.read_text(encoding='utf-8')
+                for path in sorted(FIXTURES_DIR.glob('app_*.html'))}
+    if recorded:
+        return recorded
+    return {appid: store_page(synthetic_game(appid)) for appid in range(10, 10 + count * 10, 10)}
@@ -0,0 +1,55 @@
+from collections import Counter
+
+from pymongo import UpdateOne
+
+# game counts per tag, feature, developer and publisher, kept in the facets collection. every write to steam_apps
+# hands its before/after documents to facet_deltas, so reading the counts never touches steam_apps
+
+FACETS = {
+    'tags': 'tags',
+    'features': 'features',
+    'developers': 'developers.developer',
+    'publishers': 'developers.publisher'
+}
+
+
+def facet_values(game: dict | None) -> set[tuple[str, str]]:
+    if not game:
+        return set()
+    values = set()
+    for facet, path in FACETS.items():
+        value = game
+        for key in path.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        for item in value if isinstance(value, list) else [value]:
+            if item:
+                values.add((facet, item))
+    return values
+
+
+def facet_deltas(old: dict | None, new: dict | None) -> Counter:
+    # (facet, value) -> +1/-1 for what the write added or removed, unchanged values cancel out
+    deltas = Counter()
+    old_values, new_values = facet_values(old), facet_values(new)
+    deltas.update(new_values - old_values)
+    deltas.subtract(old_values - new_values)
+    return deltas
+
+
+def facet_writes(deltas: Counter) -> list[UpdateOne]:
+    return [
+        UpdateOne({'facet': facet, 'value': value}, {'$inc': {'count': count}}, upsert=True)
+        for (facet, value), count in deltas.items() if count
+    ]
+
+
+def facet_pipeline(facet: str) -> list[dict]:
+    # full recount of one facet straight from steam_apps, only the rebuild migration runs this
+    path = FACETS[facet]
+    return [
+        {'$unwind': f'${path}'},
+        {'$match': {path: {'$nin': [None, '']}}},
+        {'$group': {'_id': {'game': '$_id', 'value': f'${path}'}}}, # a tag listed twice still counts the game once
+        {'$group': {'_id': '$_id.value', 'count': {'$sum': 1}}},
+        {'$project': {'_id': 0, 'facet': {'$literal': facet}, 'value': '$_id', 'count': 1}}
+    ]
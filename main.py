@@ -1,51 +1,171 @@
-from copy import deepcopy
-from typing import Annotated
-from datetime import datetime
+import asyncio
+from typing import Annotated, Literal
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, status, Query
+from fastapi import FastAPI, status, Path, Query, Response
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+import orjson
 import uvicorn
-import requests
 
-from schemas import GameMetadata
-from mongo_db_processor import MongoRepository
-from scrapers.game_page_scraper import get_game_info
-from scrapers.populate_db import top_games, top_games_metadata
-from middleware import RequestLimiter
+from schemas import MAX_APPID, Game, GameMetadata, ScoredGame, PricePeriod, TagPricePeriod, FacetCount, AddStatus, BatchAdd, BatchAddResult
+from mongo_db_processor import AsyncMongoRepository, AsyncMongoConnector, GAME_FIELDS, game_projection
+from migrations import create_indexes_async
+from scrapers.game_page_scraper import StorePageUnavailable
+from scrapers.http_client import close_http_client
+from scrapers.game_id_scraper import stream_applist
+from scrapers.populate_db import top_games, top_games_metadata, top_sellers_source, scrape_all, scrape_game
+from scrapers.rescrape import RescrapeScheduler, record_demand
+from middleware import RequestLimiter, MongoLimiterBackend
+from metrics import MetricsMiddleware, metrics_response
+from query_cache import search_cache
+from facets import FACETS
+from price_history import INTERVALS, local_naive, merge_stats, period_start, period_stats
+from applist_index import applist_index
+from settings import MIGRATE_ON_STARTUP, RATE_LIMIT_BACKEND, RATE_LIMIT_MAX_CALLS, RATE_LIMIT_TIME_WINDOW
 
-app = FastAPI()
-repository = MongoRepository()
+repository = AsyncMongoRepository()
+APPLIST_RECHECK = 60 # secs between version checks, how long another worker's applist refresh can go unnoticed
+
+
+async def refresh_applist_index():
+    # version first: a sync landing between the two reads only costs one more reload on the next check
+    version = await repository.get_applist_version()
+    apps = await repository.get_applist()
+    await asyncio.to_thread(applist_index.load, apps, version)
+
+
+async def watch_applist_version():
+    # /games/applist reloads the worker that served it, every other worker picks the new list up from here
+    while True:
+        await asyncio.sleep(APPLIST_RECHECK)
+        try:
+            if await repository.get_applist_version() != applist_index.version:
+                await refresh_applist_index()
+        except Exception:
+            pass # next check tries again
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        await create_indexes_async(AsyncMongoConnector().get_database())
+    await refresh_applist_index()
+    applist_watch = asyncio.create_task(watch_applist_version())
+    # always running: with RESCRAPE_PER_HOUR at 0 it only flushes request counts for a standalone scheduler
+    rescrape = asyncio.create_task(RescrapeScheduler(repository).run())
+    yield
+    rescrape.cancel()
+    applist_watch.cancel()
+    await top_sellers_source.aclose()
+    await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def parse_fields(fields: list[str] | None) -> list[str] | None:
+    # fields=appid,title,min_price or fields=appid&fields=title, None means every GameMetadata field
+    if not fields:
+        return None
+    requested = [field.strip() for value in fields for field in value.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in GAME_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {', '.join(unknown)}, pick from {', '.join(GAME_FIELDS)}")
+    return requested
+
+def bad_request(error: ValueError) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={'msg': str(error)})
+
+def already_added() -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={'Msg': 'Current game already in the lib'}
+    )
+
+# list endpoints hand the projected cursor documents straight to orjson, the stored documents already have the
+# response shape so there is nothing to validate on the way out. response_model only documents them
 
 @app.get('/games', response_model=list[GameMetadata])
-def get_games():
-    return [GameMetadata(**game) for game in repository.find_games([{}])]
+async def get_games(after: Annotated[int | None, Query(ge=0)] = None,
+                    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+                    stream: bool = False,
+                    fields: Annotated[list[str] | None, Query()] = None):
+    try:
+        projection = game_projection(parse_fields(fields))
+    except ValueError as error:
+        return bad_request(error)
+
+    if stream:
+        # ndjson export of everything past the cursor, written as the cursor yields so memory stays flat
+        async def _export():
+            async for game in repository.find_games_after(after, projection=projection):
+                yield orjson.dumps(game) + b'\n'
+
+        return StreamingResponse(_export(), media_type='application/x-ndjson')
+
+    games = await repository.find_games_after(after, limit, projection=projection).to_list(None)
+    response = ORJSONResponse(games)
+    if len(games) == limit:
+        response.headers['X-Next-After'] = str(games[-1]['appid'])
+    return response
+
+# declared before /games/{appid} so 'batch' isn't taken for an appid
+@app.post('/games/batch', response_model=BatchAddResult)
+async def add_games(batch: BatchAdd):
+    appids = list(dict.fromkeys(batch.appids))
+    results = dict.fromkeys(await repository.find_existing_appids(appids), AddStatus.EXISTS)
+    missing = [appid for appid in appids if appid not in results]
+
+    games = []
+    for appid, game in zip(missing, await scrape_all(missing)):
+        if isinstance(game, GameMetadata):
+            games.append(game.model_dump())
+        else:
+            # None (redirected, 404) and AttributeError (not a game page) are steam not knowing the appid.
+            # StorePageUnavailable (429, 5xx) and transport errors are the scrape going wrong, worth another try
+            results[appid] = AddStatus.NOT_FOUND if game is None or isinstance(game, AttributeError) else AddStatus.FAILED
+
+    inserted = await repository.add_games(games)
+    for game in games:
+        # not inserted means another request stored it since the $in check
+        results[game['appid']] = AddStatus.ADDED if game['appid'] in inserted else AddStatus.EXISTS
+
+    return BatchAddResult(
+        counts={add_status: sum(1 for result in results.values() if result == add_status) for add_status in AddStatus},
+        results={appid: results[appid] for appid in appids}
+    )
 
 @app.post('/games/{appid}')
-def add_game(appid: int):
-    if repository.find_game({'appid': appid}):
-        return JSONResponse(
-            status_code=status.HTTP_409_CONFLICT,
-            content={'Msg': 'Current game already in the lib'}
-        )
+async def add_game(appid: Annotated[int, Path(ge=0, le=MAX_APPID)]):
+    record_demand(appid)
+    if await repository.find_game({'appid': appid}):
+        return already_added()
     try:
-        game_to_add = get_game_info(appid).model_dump()
+        game_to_add = (await scrape_game(appid)).model_dump()
 
     except AttributeError:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={'Msg': "A game with this id doesn't exist"}
         )
+    except StorePageUnavailable:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={'Msg': 'Steam store is unavailable, try again later'}
+        )
 
-    repository.add_game(game_to_add)
+    if not await repository.add_game(game_to_add):
+        return already_added() # stored by a concurrent request while we were scraping
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={'Msg': f"Game {game_to_add['title']} has been added to the lib"}
     )
 
 @app.get('/games/top_games')
-def get_top_games(num_games: Annotated[int, Query(ge=1, le=99)]):
-    games = top_games(num_games)
+async def get_top_games(num_games: Annotated[int, Query(ge=1, le=99)]):
+    games = await top_games(num_games)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -53,8 +173,8 @@ def get_top_games(num_games: Annotated[int, Query(ge=1, le=99)]):
     )
 
 @app.get('/games/top_games_info')
-def get_top_games_info(num_games: Annotated[int, Query(ge=1, le=99)]):
-    games = top_games_metadata(num_games)
+async def get_top_games_info(num_games: Annotated[int, Query(ge=1, le=99)]):
+    games = await top_games_metadata(num_games)
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -63,7 +183,7 @@ def get_top_games_info(num_games: Annotated[int, Query(ge=1, le=99)]):
 
 
 @app.get('/games/search', response_model=list[GameMetadata])
-def search_games(appid: Annotated[int | None, Query(ge=1)] = None,
+async def search_games(appid: Annotated[int | None, Query(ge=1, le=MAX_APPID)] = None,
                  title: Annotated[str | None, Query()] = None,
                  description: Annotated[str | None, Query()] = None,
                  release_date: Annotated[datetime | None, Query()] = None,
@@ -72,7 +192,8 @@ def search_games(appid: Annotated[int | None, Query(ge=1)] = None,
                  tags: Annotated[list[str] | None, Query()] = None,
                  features: Annotated[list[str] | None, Query()] = None,
                  edition_min: Annotated[int | None, Query(ge=0)] = None,
-                 edition_max: Annotated[int | None, Query(ge=0)] = None):
+                 edition_max: Annotated[int | None, Query(ge=0)] = None,
+                 fields: Annotated[list[str] | None, Query()] = None):
 
     if not any([appid, title, description, release_date, developers, publishers, tags, edition_min, edition_max, features]):
         return JSONResponse(
@@ -80,6 +201,23 @@ def search_games(appid: Annotated[int | None, Query(ge=1)] = None,
             content={'msg': "Can't search for nothin'"}
         )
 
+    try:
+        requested_fields = parse_fields(fields)
+    except ValueError as error:
+        return bad_request(error)
+    if appid:
+        record_demand(appid)
+
+    # title and description are regex patterns, the rest compare through the case-insensitive collation
+    cache_key = search_cache.make_key(('title', 'description'), appid=appid, title=title, description=description,
+                                      release_date=release_date, developers=developers, publishers=publishers, tags=tags,
+                                      features=features, edition_min=edition_min, edition_max=edition_max,
+                                      fields=requested_fields)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+    generation = search_cache.generation
+
     params = []
     if appid:
         params.append({'appid': appid})
@@ -106,19 +244,124 @@ def search_games(appid: Annotated[int | None, Query(ge=1)] = None,
         if edition_max:
             price_search['$lte'] = edition_max
 
-    return [GameMetadata(**games) for games in repository.find_games(params, price_search=price_search)]
+    games = await repository.find_games(params, price_search=price_search, projection=game_projection(requested_fields)).to_list(None)
+    search_cache.set(cache_key, games, generation)
+    return ORJSONResponse(games)
+
+
+MAX_PRICE_PERIODS = 400
+
+def price_range(start: datetime | None, end: datetime | None, interval: str) -> tuple[datetime, datetime]:
+    # last 30 days by default, the first period starts at midnight (monday for weeks), nothing past now
+    end = min(local_naive(end) if end else datetime.now(), datetime.now())
+    start = period_start(local_naive(start) if start else end - timedelta(days=30), interval)
+    if start >= end or (end - start) / INTERVALS[interval] > MAX_PRICE_PERIODS:
+        raise ValueError(f'start must be before end and the range at most {MAX_PRICE_PERIODS} {interval}s')
+    return start, end
+
+
+@app.get('/games/{appid}/prices', response_model=dict[str, list[PricePeriod]])
+async def get_price_history(appid: Annotated[int, Path(ge=0, le=MAX_APPID)],
+                            start: datetime | None = None,
+                            end: datetime | None = None,
+                            interval: Literal['day', 'week'] = 'day'):
+    # min/avg/max per period for every edition of the game, folded from its monthly change buckets
+    try:
+        start, end = price_range(start, end, interval)
+    except ValueError as error:
+        return bad_request(error)
+
+    series = await repository.price_series([appid], start, end)
+    return {
+        edition: [{'period': period, **row} for period, row in period_stats(opening, points, start, end, interval).items()]
+        for (_, edition), (opening, points) in series.items()
+    }
+
+
+@app.get('/tags/{tag}/prices', response_model=list[TagPricePeriod])
+async def get_tag_price_history(tag: str,
+                                response: Response,
+                                start: datetime | None = None,
+                                end: datetime | None = None,
+                                interval: Literal['day', 'week'] = 'day',
+                                max_games: Annotated[int, Query(ge=1, le=5000)] = 1000):
+    # same, across every edition of every game with the tag, each edition counts once in the average
+    try:
+        start, end = price_range(start, end, interval)
+    except ValueError as error:
+        return bad_request(error)
+
+    appids, truncated = await repository.appids_with_tag(tag, max_games)
+    # more games than max_games have the tag: only the first max_games by appid are in the numbers
+    response.headers['X-Games-Used'] = str(len(appids))
+    response.headers['X-Games-Truncated'] = 'true' if truncated else 'false'
+    series = await repository.price_series(appids, start, end)
+    merged = merge_stats([period_stats(opening, points, start, end, interval) for opening, points in series.values()])
+    return [{'period': period, **row} for period, row in merged.items()]
+
+
+@app.get('/games/search/cache')
+async def search_cache_stats():
+    return search_cache.stats()
+
+
+@app.get('/games/facets', response_model=dict[str, list[FacetCount]])
+async def get_facets(facet: Annotated[list[Literal['tags', 'features', 'developers', 'publishers']] | None, Query()] = None,
+                     limit: Annotated[int, Query(ge=1, le=500)] = 50):
+    # most common values first, from the precomputed facets collection instead of an $unwind over steam_apps
+    names = list(dict.fromkeys(facet or FACETS))
+    counts = await asyncio.gather(*(repository.get_facets(name, limit) for name in names))
+    return dict(zip(names, counts))
+
+
+@app.get('/games/search/text', response_model=list[ScoredGame])
+async def text_search_games(q: Annotated[str, Query(min_length=1)],
+                            limit: Annotated[int, Query(ge=1, le=100)] = 20):
+    # ranked full-text search on the weighted title/description text index, best match first
+    return [ScoredGame(**game) async for game in repository.search_games(q, limit)]
 
 
 @app.get('/games/applist', include_in_schema=False)
-def get_appids():
+async def get_appids():
+    # refreshes the stored app list from steam, answers with what changed rather than the 250k entries
+    counts = await repository.sync_applist(stream_applist())
+    if counts['added'] or counts['updated'] or counts['removed']:
+        await refresh_applist_index()
+    return counts
+
+
+@app.get('/apps', response_model=list[Game])
+async def find_apps(prefix: Annotated[str, Query(min_length=1)],
+                    limit: Annotated[int, Query(ge=1, le=50)] = 10):
+    # title autocomplete straight from the in-memory applist index, no db involved
+    return [Game(appid=appid, title=title) for appid, title in applist_index.prefix(prefix, limit)]
+
+
+@app.get('/apps/{appid}', response_model=Game)
+async def get_app(appid: int):
+    title = applist_index.title(appid)
+    if title is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={'Msg': "An app with this id doesn't exist"}
+        )
+    return Game(appid=appid, title=title)
+
 
-    response = requests.get('https://api.steampowered.com/ISteamApps/GetAppList/v2', timeout=10)
-    applist = response.json()['applist']['apps']
-    repository.insert_applist(deepcopy(applist))
-    return applist
+@app.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    return metrics_response()
 
 
-app.add_middleware(RequestLimiter)
+# with several workers the in-process limiter gives every worker its own budget, share it through mongo instead
+app.add_middleware(
+    RequestLimiter,
+    max_calls=RATE_LIMIT_MAX_CALLS,
+    time_window=RATE_LIMIT_TIME_WINDOW,
+    backend=MongoLimiterBackend(RATE_LIMIT_MAX_CALLS, RATE_LIMIT_TIME_WINDOW) if RATE_LIMIT_BACKEND == 'mongo' else None
+)
+# added last so it wraps the limiter and times the 429s too
+app.add_middleware(MetricsMiddleware)
 
 
 if __name__ == '__main__':
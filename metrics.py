@@ -0,0 +1,81 @@
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# prometheus metrics for this process. everything is a labelled child lookup plus a locked add, cheap enough to keep
+# on in production. labels are route templates, collection and command names, never raw paths or appids
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route', ['method', 'route'])
+REQUESTS = Counter('http_requests', 'Responses by route and status', ['method', 'route', 'status'])
+
+MONGO_LATENCY = Histogram(
+    'mongo_command_duration_seconds', 'Mongo command latency by collection and command', ['collection', 'command'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+MONGO_FAILURES = Counter('mongo_command_failures', 'Failed mongo commands by collection and command', ['collection', 'command'])
+
+# fetch and parse of store pages, every PageScraper.get_* on its own, and the top sellers chart sources
+SCRAPE_LATENCY = Histogram('scrape_stage_duration_seconds', 'Scraper latency by stage', ['stage'])
+
+RATE_LIMIT_REJECTIONS = Counter('rate_limit_rejections', 'Requests answered with 429')
+RATE_LIMIT_CLIENTS = Gauge('rate_limit_tracked_clients', 'Clients the rate limiter currently keeps state for')
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # the finished events don't carry the command, remember each command's collection until it finishes.
+    # runs on whatever thread pymongo (or motor's executor) sends from
+
+    def __init__(self):
+        self._collections: dict[tuple, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        target = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ''
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+class MetricsMiddleware:
+    # pure asgi, nothing is buffered. the router leaves the matched route in the scope, anything it didn't
+    # match (404s, requests the rate limiter turned away) shares one label
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            route = route.path if route is not None else 'unmatched'
+            REQUEST_LATENCY.labels(scope['method'], route).observe(time.perf_counter() - start)
+            REQUESTS.labels(scope['method'], route, str(status_code)).inc()
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), headers={'Content-Type': CONTENT_TYPE_LATEST}) # already carries its charset
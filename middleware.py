@@ -1,50 +1,207 @@
-from datetime import datetime, timedelta
-from collections import defaultdict
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from fastapi.requests import Request
+from pymongo import ReturnDocument
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi.responses import JSONResponse
 from fastapi import status
 
+from mongo_db_processor import AsyncMongoConnector, CollectionNames
+from metrics import RATE_LIMIT_CLIENTS, RATE_LIMIT_REJECTIONS
+
+
+class _ClientWindow:
+    # three numbers per client instead of a dict, there can be a lot of these
+    __slots__ = ('start', 'previous', 'current')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.previous = 0
+        self.current = 0
+
 
-class RequestLimiter(BaseHTTPMiddleware):
+class InMemoryLimiterBackend:
+    # sliding window counter: the previous window's count is weighted by how much of it still overlaps the last
+    # time_window seconds, so a client can't burst 2 * max_calls around a window edge.
+    # state lives in this process only, fine for a single worker
 
     def __init__(self,
-                 app,
-                 dispatch = None,
                  max_calls: int = 100,
-                 time_window: int = 10):
-        super().__init__(app, dispatch)
+                 time_window: int = 10,
+                 max_clients: int = 100_000):
         self.max_calls = max_calls
         self.time_window = time_window
-        self.call_track = defaultdict(dict)
+        self.max_clients = max_clients
+        self.call_track: OrderedDict[str, _ClientWindow] = OrderedDict()
+
+    @property
+    def tracked_clients(self) -> int:
+        return len(self.call_track)
+
+    def _evict(self, now: float):
+        # lru order, so stale clients pile up at the front. anything idle for two windows has nothing left to count
+        while self.call_track:
+            client_ip, client = next(iter(self.call_track.items()))
+            if len(self.call_track) <= self.max_clients and now - client.start < 2 * self.time_window:
+                break
+            del self.call_track[client_ip]
+
+    async def hit(self, client_ip: str) -> tuple[bool, int, float]:
+        # returns (allowed, remaining calls, seconds until the window rolls over)
+        now = time.monotonic()
+        client = self.call_track.get(client_ip)
+        if client is None:
+            client = self.call_track[client_ip] = _ClientWindow(now)
+            self._evict(now)
+        else:
+            self.call_track.move_to_end(client_ip)
+
+        elapsed = now - client.start
+        if elapsed >= self.time_window:
+            windows_passed = int(elapsed // self.time_window)
+            client.previous = client.current if windows_passed == 1 else 0
+            client.current = 0
+            client.start += windows_passed * self.time_window
+            elapsed = now - client.start
+
+        estimate = client.previous * (1 - elapsed / self.time_window) + client.current
+        if estimate + 1 > self.max_calls:
+            return False, 0, self._time_to_wait(client, elapsed)
+
+        client.current += 1
+        return True, int(self.max_calls - estimate - 1), self.time_window - elapsed
+
+    def _time_to_wait(self, client: _ClientWindow, elapsed: float) -> float:
+        free_calls = self.max_calls - client.current - 1
+        if client.previous and free_calls >= 0:
+            # wait until enough of the previous window has slid out
+            return max(self.time_window * (1 - free_calls / client.previous) - elapsed, 0.0)
+        # current window alone is full, the next one starts with it as the weighted previous
+        return self.time_window - elapsed + self.time_window * (1 - (self.max_calls - 1) / max(client.current, 1))
+
+
+class _Lease:
+    __slots__ = ('window', 'tokens', 'used', 'exhausted')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.tokens = 0
+        self.used = 0
+        self.exhausted = False
+
+
+class MongoLimiterBackend:
+    # fixed windows on wall clock time, counted in mongo so every worker shares one budget per client.
+    # workers claim lease_size calls at a time with one $inc and hand them out locally,
+    # so only every lease_size-th request of a client touches the db
 
-    def new_client(self, client_ip: str):
-        first_request = datetime.now()
-        self.call_track[client_ip]['remaining'] = self.max_calls
-        self.call_track[client_ip]['first_request'] = first_request
+    def __init__(self,
+                 max_calls: int = 100,
+                 time_window: int = 10,
+                 lease_size: int = 10,
+                 max_clients: int = 100_000,
+                 connector: AsyncMongoConnector | None = None):
+        self.max_calls = max_calls
+        self.time_window = time_window
+        self.lease_size = min(lease_size, max_calls)
+        self.max_clients = max_clients
+        self._connector = connector or AsyncMongoConnector()
+        self._leases: OrderedDict[str, _Lease] = OrderedDict()
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-        client_ip = request.client.host
-        
-        if client_ip not in self.call_track:
-            self.new_client(client_ip)
+    @property
+    def tracked_clients(self) -> int:
+        return len(self._leases)
 
-        client = self.call_track[client_ip]
-        request_time = datetime.now()
-        request_diff: timedelta = request_time - client['first_request']
+    async def _claim(self, client_ip: str, window: int) -> tuple[int, int]:
+        # the ttl index on expires_at that drops finished windows is created by migrations.create_indexes
+        counter = await self._connector.get_collection(CollectionNames.RATE_LIMITS).find_one_and_update(
+            {'_id': f'{client_ip}:{window}'},
+            {
+                '$inc': {'used': self.lease_size},
+                '$setOnInsert': {'expires_at': datetime.fromtimestamp((window + 2) * self.time_window, tz=timezone.utc)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        used_before = counter['used'] - self.lease_size
+        return max(0, min(self.lease_size, self.max_calls - used_before)), counter['used']
 
-        if request_diff.total_seconds() > self.time_window:
-            self.new_client(client_ip)
-            client = self.call_track[client_ip]
+    async def hit(self, client_ip: str) -> tuple[bool, int, float]:
+        now = time.time()
+        window = int(now // self.time_window)
+        reset = (window + 1) * self.time_window - now
 
+        lease = self._leases.get(client_ip)
+        if lease is None or lease.window != window:
+            lease = self._leases[client_ip] = _Lease(window)
+            self._leases.move_to_end(client_ip)
+            while len(self._leases) > self.max_clients:
+                self._leases.popitem(last=False)
         else:
-            if client['remaining'] <= 0:
-                time_to_wait = self.time_window - request_diff.total_seconds()
-                return JSONResponse(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    content={'msg': f"You will be able to use this api in {time_to_wait:.2f} secs"}
-                )
-
-        client['remaining'] -= 1
-        return await call_next(request)
\ No newline at end of file
+            self._leases.move_to_end(client_ip)
+
+        if not lease.tokens:
+            if lease.exhausted:
+                return False, 0, reset
+
+            granted, lease.used = await self._claim(client_ip, window)
+            if not granted:
+                lease.exhausted = True
+                return False, 0, reset
+            lease.tokens += granted
+
+        lease.tokens -= 1
+        return True, max(self.max_calls - lease.used, 0) + lease.tokens, reset
+
+
+class RequestLimiter:
+
+    def __init__(self,
+                 app: ASGIApp,
+                 max_calls: int = 100,
+                 time_window: int = 10,
+                 max_clients: int = 100_000,
+                 backend: InMemoryLimiterBackend | MongoLimiterBackend | None = None):
+        self.app = app
+        self.backend = backend or InMemoryLimiterBackend(max_calls, time_window, max_clients)
+        self.max_calls = self.backend.max_calls
+        self._limit_header = (b'ratelimit-limit', str(self.max_calls).encode())
+        RATE_LIMIT_CLIENTS.set_function(lambda: self.backend.tracked_clients) # read at scrape time only
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        client = scope.get('client')
+        client_ip = client[0] if client else 'unknown'
+        allowed, remaining, reset = await self.backend.hit(client_ip)
+
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.inc()
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={'msg': f"You will be able to use this api in {reset:.2f} secs"},
+                headers={
+                    'Retry-After': str(math.ceil(reset)),
+                    'RateLimit-Limit': str(self.max_calls),
+                    'RateLimit-Remaining': '0',
+                    'RateLimit-Reset': str(math.ceil(reset))
+                }
+            )
+            return await response(scope, receive, send)
+
+        rate_headers = [
+            self._limit_header,
+            (b'ratelimit-remaining', str(remaining).encode()),
+            (b'ratelimit-reset', str(math.ceil(reset)).encode())
+        ]
+
+        async def send_with_headers(message: Message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), *rate_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,153 @@
+import argparse
+import os
+from collections import Counter
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo import IndexModel, UpdateOne
+from pymongo.database import Database
+
+from facets import FACETS, facet_deltas, facet_pipeline, facet_writes
+from mongo_db_processor import CollectionNames, MongoConnector, price_fields, steam_apps_indexes
+from price_history import price_writes
+from scrapers.game_page_scraper import parse_game_page
+from scrapers.page_cache import CachedPage, get_page_cache
+
+
+def index_plan() -> dict[str, list[IndexModel]]:
+    return {
+        # scraped_at and demand order the re-scrape queue
+        CollectionNames.STEAM_APPS: [*steam_apps_indexes(), IndexModel('scraped_at'), IndexModel('demand', sparse=True)],
+        CollectionNames.APPLIST: [IndexModel('appid')],
+        CollectionNames.TOP_GAMES: [IndexModel([('version', 1), ('rank', 1)])],
+        CollectionNames.PRICE_HISTORY: [IndexModel([('appid', 1), ('edition', 1), ('month', 1)], unique=True)],
+        CollectionNames.FACETS: [IndexModel([('facet', 1), ('value', 1)], unique=True), IndexModel([('facet', 1), ('count', -1)])],
+        # rate limit counters only matter for their window, let mongo drop them afterwards
+        CollectionNames.RATE_LIMITS: [IndexModel('expires_at', expireAfterSeconds=0)]
+    }
+
+
+def create_indexes(db: Database) -> list[str]:
+    # createIndexes with specs that already exist is a no-op on the server, one command per collection
+    return [name for collection, indexes in index_plan().items() for name in db[collection].create_indexes(indexes)]
+
+
+async def create_indexes_async(db) -> list[str]:
+    # same thing through motor, for the app lifespan
+    return [name for collection, indexes in index_plan().items() for name in await db[collection].create_indexes(indexes)]
+
+
+def backfill_price_fields(db: Database, chunk_size: int = 1000) -> int:
+    steam_apps = db[CollectionNames.STEAM_APPS]
+    updated = 0
+    updates = []
+
+    for game in steam_apps.find({'prices': {'$exists': False}}, {'editions': 1}):
+        updates.append(UpdateOne({'_id': game['_id']}, {'$set': price_fields(game.get('editions'))}))
+        if len(updates) >= chunk_size:
+            updated += steam_apps.bulk_write(updates, ordered=False).modified_count
+            updates = []
+
+    if updates:
+        updated += steam_apps.bulk_write(updates, ordered=False).modified_count
+    return updated
+
+
+def _parse_cached(page: CachedPage) -> dict | None:
+    # runs in a forked worker, reads the blob file only and leaves the inherited sqlite connection alone
+    html = get_page_cache().read(page, touch=False)
+    try:
+        game = parse_game_page(page.appid, html).model_dump() if html is not None else None
+    except (AttributeError, ValueError):
+        return None # a page the scraper can't read, same as a failed scrape
+    if game is not None:
+        game['scraped_at'] = datetime.fromtimestamp(page.fetched_at)
+    return game
+
+
+def rebuild_from_page_cache(db: Database, chunk_size: int = 500) -> dict[str, int]:
+    # re-parse every cached store page into steam_apps, no network. run it after the extraction logic changes.
+    # facet counts and price history get the same deltas as any other write, against what each game looked like before
+    page_cache = get_page_cache()
+    if page_cache is None:
+        raise SystemExit('rebuild-steam-apps reads the page cache, set PAGE_CACHE_DIR to where it is')
+    steam_apps = db[CollectionNames.STEAM_APPS]
+    counts = {'parsed': 0, 'failed': 0, 'upserted': 0, 'modified': 0}
+    games = []
+
+    def _flush():
+        projection = {'_id': 0, **{path.split('.')[0]: 1 for path in FACETS.values()}, 'appid': 1, 'editions': 1}
+        stored = {game['appid']: game for game in steam_apps.find({'appid': {'$in': [game['appid'] for game in games]}}, projection)}
+
+        # $max: a game the api scraped after this page was cached keeps its newer scraped_at
+        result = steam_apps.bulk_write([
+            UpdateOne(
+                {'appid': game['appid']},
+                {
+                    '$set': {field: value for field, value in game.items() if field != 'scraped_at'},
+                    '$max': {'scraped_at': game['scraped_at']}
+                },
+                upsert=True
+            )
+            for game in games
+        ], ordered=False)
+        counts['upserted'] += result.upserted_count
+        counts['modified'] += result.modified_count
+
+        deltas = Counter()
+        for game in games:
+            deltas.update(facet_deltas(stored.get(game['appid']), game))
+        if writes := facet_writes(deltas):
+            db[CollectionNames.FACETS].bulk_write(writes, ordered=False)
+        prices = [(game['appid'], stored.get(game['appid'], {}).get('editions'), game['editions']) for game in games]
+        if writes := price_writes(prices, datetime.now()):
+            db[CollectionNames.PRICE_HISTORY].bulk_write(writes, ordered=False)
+        games.clear()
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for game in pool.map(_parse_cached, page_cache.entries(), chunksize=16):
+            if game is None:
+                counts['failed'] += 1
+                continue
+            counts['parsed'] += 1
+            game.update(price_fields(game['editions']))
+            games.append(game)
+            if len(games) >= chunk_size:
+                _flush()
+    if games:
+        _flush()
+    return counts
+
+
+def rebuild_facets(db: Database) -> dict[str, int]:
+    # recount everything into a staging collection and swap it in, readers keep the old counts until the rename
+    staging = db[f'{CollectionNames.FACETS}_rebuild']
+    staging.drop()
+    staging.create_indexes(index_plan()[CollectionNames.FACETS])
+
+    values = {}
+    for facet in FACETS:
+        counts = list(db[CollectionNames.STEAM_APPS].aggregate(facet_pipeline(facet), allowDiskUse=True))
+        if counts:
+            staging.insert_many(counts)
+        values[facet] = len(counts)
+
+    staging.rename(CollectionNames.FACETS, dropTarget=True)
+    return values
+
+
+MIGRATIONS = {
+    'indexes': create_indexes,
+    'backfill-prices': backfill_price_fields,
+    'rebuild-steam-apps': rebuild_from_page_cache,
+    'rebuild-facets': rebuild_facets
+}
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='One-shot data migrations for the steam db')
+    arg_parser.add_argument('migration', choices=MIGRATIONS.keys())
+    args = arg_parser.parse_args()
+
+    result = MIGRATIONS[args.migration](MongoConnector().get_database())
+    print(f'{args.migration}: {result}')
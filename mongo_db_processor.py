@@ -1,13 +1,27 @@
-from datetime import datetime
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import AsyncIterator
 from enum import StrEnum
 
-from pymongo import MongoClient, IndexModel
-from pymongo.database import Collection
+from pymongo import MongoClient, IndexModel, TEXT, UpdateOne, DeleteMany
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorClient
 
 from schemas import GameMetadata
+from price_history import month_start, price_writes
+from facets import facet_deltas, facet_writes
+from metrics import mongo_command_metrics
+from query_cache import search_cache
+from settings import MONGO_URI, MONGO_DB, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE
 
 class DBEnums(StrEnum):
     LAST_TOP_GAMES_UPDATE = 'last_top_games_update'
+    TOP_GAMES_REFRESH_LOCK = 'top_games_refresh_lock'
+    RESCRAPE_LOCK = 'rescrape_lock'
+    BACKFILL_CRAWL = 'backfill_crawl'
+    APPLIST_VERSION = 'applist_version'
 
 class CollectionNames(StrEnum):
     STEAM_GAME_IDS = 'steam_game_ids'
@@ -15,64 +29,147 @@ class CollectionNames(StrEnum):
     APP_METADATA = 'app_metadata'
     TOP_GAMES = 'top_games'
     APPLIST = 'applist'
+    RATE_LIMITS = 'rate_limits'
+    PRICE_HISTORY = 'price_history'
+    FACETS = 'facets'
+
+
+_clients: dict[tuple[type, str], MongoClient | AsyncIOMotorClient] = {}
+
+
+def get_client(connection_string: str = MONGO_URI, client_class: type = MongoClient):
+    # one pool per process and uri, opened on first use rather than on import. every command it sends is timed
+    key = (client_class, connection_string)
+    if key not in _clients:
+        _clients[key] = client_class(
+            connection_string,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            event_listeners=[mongo_command_metrics]
+        )
+    return _clients[key]
 
 
 class MongoConnector:
 
-    def __init__(self, connection_string: str = 'mongodb://localhost:27017/'):
-        self.client: MongoClient = MongoClient(connection_string)
+    def __init__(self, connection_string: str = MONGO_URI):
+        self._connection_string = connection_string
 
-    def get_database(self, db_name: str = 'steam'):
+    @property
+    def client(self) -> MongoClient:
+        return get_client(self._connection_string, MongoClient)
+
+    def get_database(self, db_name: str = MONGO_DB):
         return self.client[db_name]
 
-    def get_collection(self,  collection_name: str, db_name: str = 'steam'):
+    def get_collection(self,  collection_name: str, db_name: str = MONGO_DB):
         return self.client[db_name][collection_name]
 
-class MongoCollections:
+class AsyncMongoConnector:
 
-    def __init__(self):
-        connector = MongoConnector()
-        self._game_id_collection: Collection = connector.get_collection(CollectionNames.STEAM_GAME_IDS)
-        self._steam_apps_collection: Collection = connector.get_collection(CollectionNames.STEAM_APPS)
-        self._app_metadata: Collection = connector.get_collection(CollectionNames.APP_METADATA)
-        self._top_games: Collection = connector.get_collection(CollectionNames.TOP_GAMES)
-        self._applist: Collection = connector.get_collection(CollectionNames.APPLIST)
-        self.__create_indexes()
-
-    def __create_indexes(self):
-        #indexes are useless on objects
-        indexes = [index for index in GameMetadata.model_fields.keys() if index not in ('editions','developers')]
-
-        for index in indexes:
-            if index == 'appid':
-                self._steam_apps_collection.create_index(index, unique=True)
-            else:
-                self._steam_apps_collection.create_index(index, collation={'locale': 'en_US', 'strength': 2})
+    def __init__(self, connection_string: str = MONGO_URI):
+        self._connection_string = connection_string
 
-        developer_index = IndexModel('developers.developer')
-        publisher_index = IndexModel('developers.publisher')
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        return get_client(self._connection_string, AsyncIOMotorClient)
 
-        self._steam_apps_collection.create_indexes([developer_index, publisher_index])
+    def get_database(self, db_name: str = MONGO_DB):
+        return self.client[db_name]
 
-    @property
+    def get_collection(self,  collection_name: str, db_name: str = MONGO_DB):
+        return self.client[db_name][collection_name]
+
+
+def steam_apps_indexes() -> list[IndexModel]:
+    #indexes are useless on objects
+    indexes = [index for index in GameMetadata.model_fields.keys() if index not in ('editions','developers')]
+
+    index_models = []
+    for index in indexes:
+        if index == 'appid':
+            index_models.append(IndexModel(index, unique=True))
+        else:
+            index_models.append(IndexModel(index, collation={'locale': 'en_US', 'strength': 2}))
+
+    index_models.append(IndexModel('developers.developer'))
+    index_models.append(IndexModel('developers.publisher'))
+    for price_field in ('prices', 'min_price', 'max_price'):
+        index_models.append(IndexModel(price_field))
+
+    # only one text index per collection, a title hit counts 10x a description hit
+    index_models.append(IndexModel(
+        [('title', TEXT), ('description', TEXT)],
+        weights={'title': 10, 'description': 1},
+        name='title_description_text'
+    ))
+    return index_models
+
+
+def price_fields(editions: dict[str, float] | None) -> dict:
+    # editions is an object keyed by edition name, which no index can range over. keep the prices next to it
+    prices = sorted(set(editions.values())) if editions else []
+    return {
+        'prices': prices,
+        'min_price': prices[0] if prices else None,
+        'max_price': prices[-1] if prices else None
+    }
+
+
+# what clients can ask for with fields=, the stored document minus _id and the full prices array
+GAME_FIELDS = (*GameMetadata.model_fields, 'min_price', 'max_price')
+
+
+def game_projection(fields: list[str] | None = None) -> dict:
+    # appid always comes along, pages and caches are keyed on it
+    return {'_id': 0, 'appid': 1, **{field: 1 for field in fields or GameMetadata.model_fields}}
+
+
+class _Collections:
+    # collections are looked up on first access, so building a repository never touches the client
+
+    def __init__(self, connector: MongoConnector | AsyncMongoConnector):
+        self._connector = connector
+
+    @cached_property
     def game_id_collection(self):
-        return self._game_id_collection
+        return self._connector.get_collection(CollectionNames.STEAM_GAME_IDS)
 
-    @property
+    @cached_property
     def steam_apps_collection(self):
-        return self._steam_apps_collection
+        return self._connector.get_collection(CollectionNames.STEAM_APPS)
 
-    @property
+    @cached_property
     def app_metadata(self):
-        return self._app_metadata
+        return self._connector.get_collection(CollectionNames.APP_METADATA)
 
-    @property
+    @cached_property
     def top_games(self):
-        return self._top_games
+        return self._connector.get_collection(CollectionNames.TOP_GAMES)
 
-    @property
+    @cached_property
     def applist(self):
-        return self._applist
+        return self._connector.get_collection(CollectionNames.APPLIST)
+
+    @cached_property
+    def price_history(self):
+        return self._connector.get_collection(CollectionNames.PRICE_HISTORY)
+
+    @cached_property
+    def facets(self):
+        return self._connector.get_collection(CollectionNames.FACETS)
+
+
+class MongoCollections(_Collections):
+
+    def __init__(self):
+        super().__init__(MongoConnector())
+
+
+class AsyncMongoCollections(_Collections):
+
+    def __init__(self):
+        super().__init__(AsyncMongoConnector())
 
 
 class MongoRepository:
@@ -85,14 +182,10 @@ class MongoRepository:
             if not queries:
                 queries.append({})
 
+            # prices is a denormalized copy of the edition prices, so this is a range scan on its multikey index
             return self._collections.steam_apps_collection.aggregate([
-                {'$addFields': {
-                    'editionsArray': {
-                        '$objectToArray': '$editions'
-                    }
-                }},
                 {'$match': {
-                    'editionsArray.v': price_search,
+                    'prices': {'$elemMatch': price_search},
                     '$or': queries
                 }}
             ],
@@ -104,8 +197,11 @@ class MongoRepository:
                 }],
                 collation={'locale': 'en_US', 'strength': 2})
 
-    def search_games(self, text: str):
-        return self._collections.steam_apps_collection.find({'$text': {'$search': text}})
+    def search_games(self, text: str, limit: int = 20):
+        return self._collections.steam_apps_collection.find(
+            {'$text': {'$search': text}},
+            {'_id': 0, 'score': {'$meta': 'textScore'}}
+        ).sort([('score', {'$meta': 'textScore'})]).limit(limit)
 
     def find_game(self, query):
         return self._collections.steam_apps_collection.find_one(query, {'_id': 0})
@@ -115,26 +211,20 @@ class MongoRepository:
 
     def add_game(self, game):
         if not self.find_game({'appid': game.get('appid')}):
+            game.update(price_fields(game.get('editions')))
             self._collections.steam_apps_collection.insert_one(game)
+            self.update_facets(facet_deltas(None, game))
+
+    def update_facets(self, deltas):
+        if writes := facet_writes(deltas):
+            self._collections.facets.bulk_write(writes, ordered=False)
 
     def get_len(self):
         return self._collections.steam_apps_collection.count_documents({})
 
-    def add_to_top(self, game):
-        self._collections.top_games.insert_one(game)
-
-    def clear_top(self):
-        self._collections.top_games.delete_many({})
-
     def delete_game(self, appid: int):
-        self._collections.steam_apps_collection.delete_one({'appid': appid})
-
-    def get_top(self, num_games: int):
-        return self._collections.top_games.find({}, {'_id': 0}).limit(num_games)
-
-    def insert_applist(self, applist: dict):
-        self._collections.applist.delete_many({}) # easier to drop everything than check all 250k games
-        self._collections.applist.insert_many(applist)
+        game = self._collections.steam_apps_collection.find_one_and_delete({'appid': appid})
+        self.update_facets(facet_deltas(game, None))
 
     def update_operation_time(self, operation: str):
         self._collections.app_metadata.update_one(
@@ -158,3 +248,319 @@ class MongoRepository:
 
         time_diff = datetime.now() - last_update
         return time_diff.total_seconds() >= (hours * 3600)
+
+
+class AsyncMongoRepository:
+
+    def __init__(self):
+        self._collections = AsyncMongoCollections()
+
+    def find_games(self, queries: list, price_search: dict[str, int] | None = None, projection: dict | None = None):
+        project = {'$project': projection or {'_id': 0}}
+        if price_search:
+            if not queries:
+                queries.append({})
+
+            # prices is a denormalized copy of the edition prices, so this is a range scan on its multikey index
+            return self._collections.steam_apps_collection.aggregate([
+                {'$match': {
+                    'prices': {'$elemMatch': price_search},
+                    '$or': queries
+                }},
+                project
+            ],
+            collation={'locale': 'en_US', 'strength': 2})
+        else:
+            return self._collections.steam_apps_collection.aggregate([
+                {'$match':
+                    {'$or': queries}
+                },
+                project],
+                collation={'locale': 'en_US', 'strength': 2})
+
+    def find_games_after(self,
+                         after: int | None = None,
+                         limit: int | None = None,
+                         batch_size: int = 500,
+                         projection: dict | None = None):
+        # keyset pagination over the unique appid index, no skip() so deep pages cost the same as the first one
+        query = {'appid': {'$gt': after}} if after is not None else {}
+        cursor = self._collections.steam_apps_collection.find(query, projection or {'_id': 0}).sort('appid', 1).batch_size(batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def search_games(self, text: str, limit: int = 20):
+        return self._collections.steam_apps_collection.find(
+            {'$text': {'$search': text}},
+            {'_id': 0, 'score': {'$meta': 'textScore'}}
+        ).sort([('score', {'$meta': 'textScore'})]).limit(limit)
+
+    async def find_game(self, query):
+        return await self._collections.steam_apps_collection.find_one(query, {'_id': 0})
+
+    async def find_first_game(self):
+        return await self._collections.steam_apps_collection.find_one({}, {'_id': 0})
+
+    def find_games_by_appids(self, appids: list[int], projection: dict | None = None):
+        return self._collections.steam_apps_collection.find({'appid': {'$in': appids}}, projection or {'_id': 0})
+
+    async def add_game(self, game) -> bool:
+        return bool(await self.add_games([game]))
+
+    async def add_games(self, games: list[dict]) -> set[int]:
+        # unordered bulk upsert on the unique appid index. $setOnInsert leaves stored games alone, so two requests adding
+        # the same appid can't both insert it. returns the appids this call actually inserted
+        now = datetime.now()
+        for game in games:
+            game.update(price_fields(game.get('editions')))
+            game.setdefault('scraped_at', now)
+        writes = [UpdateOne({'appid': game['appid']}, {'$setOnInsert': game}, upsert=True) for game in games]
+        if not writes:
+            return set()
+
+        failure = None
+        try:
+            upserted = (await self._collections.steam_apps_collection.bulk_write(writes, ordered=False)).upserted_ids
+        except BulkWriteError as error:
+            # concurrent upserts of a new appid: the loser hits the unique index (11000), the game is stored either way.
+            # anything else (validation, document too large) is raised once the games that did go in are accounted for
+            upserted = {item['index']: item['_id'] for item in error.details.get('upserted', [])}
+            if any(write_error['code'] != 11000 for write_error in error.details.get('writeErrors', [])):
+                failure = error
+        inserted = [games[index] for index in upserted]
+
+        if inserted:
+            await self.record_price_changes([(game['appid'], None, game.get('editions')) for game in inserted])
+            deltas = Counter()
+            for game in inserted:
+                deltas.update(facet_deltas(None, game))
+            await self.update_facets(deltas)
+            search_cache.invalidate()
+        if failure:
+            raise failure
+        return {game['appid'] for game in inserted}
+
+    async def update_facets(self, deltas: Counter):
+        # counts at zero stay around, a rebuild clears them out
+        if writes := facet_writes(deltas):
+            await self._collections.facets.bulk_write(writes, ordered=False)
+
+    async def get_facets(self, facet: str, limit: int) -> list[dict]:
+        # the (facet, count) index hands over the top values directly, cost depends on limit and not on the library
+        cursor = self._collections.facets.find(
+            {'facet': facet, 'count': {'$gt': 0}}, {'_id': 0, 'value': 1, 'count': 1}
+        ).sort('count', -1).limit(limit)
+        return await cursor.to_list(None)
+
+    async def get_len(self):
+        return await self._collections.steam_apps_collection.count_documents({})
+
+    def stale_games(self, before: datetime, limit: int):
+        # $not $gte also matches games stored before scraped_at existed, they sort first.
+        # games whose last scrape failed sit out until their retry_at
+        return self._collections.steam_apps_collection.find(
+            {'scraped_at': {'$not': {'$gte': before}}, 'retry_at': {'$not': {'$gt': datetime.now()}}},
+            {'_id': 0, 'appid': 1, 'scraped_at': 1, 'demand': 1}
+        ).sort('scraped_at', 1).limit(limit)
+
+    def demanded_games(self, limit: int):
+        return self._collections.steam_apps_collection.find(
+            {'demand': {'$gt': 0}, 'retry_at': {'$not': {'$gt': datetime.now()}}},
+            {'_id': 0, 'appid': 1, 'scraped_at': 1, 'demand': 1}
+        ).sort('demand', -1).limit(limit)
+
+    async def record_demand(self, counts: dict[int, int]):
+        writes = [UpdateOne({'appid': appid}, {'$inc': {'demand': hits}}) for appid, hits in counts.items()]
+        if writes:
+            await self._collections.steam_apps_collection.bulk_write(writes, ordered=False)
+
+    async def mark_scraped(self, changes: dict[int, dict]):
+        # field level: only what changed gets $set, scraped_at always moves and demand restarts so the game leaves the queue
+        now = datetime.now()
+        writes = [
+            UpdateOne(
+                {'appid': appid},
+                {'$set': {**fields, 'scraped_at': now, 'demand': 0}, '$unset': {'retry_at': '', 'scrape_failures': ''}}
+            )
+            for appid, fields in changes.items()
+        ]
+        if writes:
+            await self._collections.steam_apps_collection.bulk_write(writes, ordered=False)
+        if any(changes.values()):
+            search_cache.invalidate()
+
+    async def mark_failed(self, retries: dict[int, datetime]):
+        # appid -> when to try again. scraped_at and demand stay, the game is still as stale as it was
+        writes = [
+            UpdateOne({'appid': appid}, {'$set': {'retry_at': retry_at}, '$inc': {'scrape_failures': 1}})
+            for appid, retry_at in retries.items()
+        ]
+        if writes:
+            await self._collections.steam_apps_collection.bulk_write(writes, ordered=False)
+
+    async def record_price_changes(self, games: list[tuple[int, dict | None, dict | None]]):
+        if writes := price_writes(games, datetime.now()):
+            await self._collections.price_history.bulk_write(writes, ordered=False)
+
+    async def price_series(self, appids: list[int], start: datetime, end: datetime) -> dict[tuple[int, str], tuple]:
+        # (appid, edition) -> (price at start, change points up to end). the opening price of series that didn't
+        # change in the first month comes from the close of their last earlier bucket
+        series = {}
+        async for carry in self._collections.price_history.aggregate([
+            {'$match': {'appid': {'$in': appids}, 'month': {'$lt': month_start(start)}}},
+            {'$sort': {'month': 1}},
+            {'$group': {'_id': {'appid': '$appid', 'edition': '$edition'}, 'close': {'$last': '$close'}}}
+        ]):
+            series[(carry['_id']['appid'], carry['_id']['edition'])] = (carry['close'], [])
+
+        buckets = self._collections.price_history.find(
+            {'appid': {'$in': appids}, 'month': {'$gte': month_start(start), '$lte': end}},
+            {'_id': 0}
+        ).sort('month', 1)
+        async for bucket in buckets:
+            _, points = series.setdefault((bucket['appid'], bucket['edition']), (bucket['open'], []))
+            points.extend((point['at'], point['price']) for point in bucket['points'])
+        return series
+
+    async def appids_with_tag(self, tag: str, limit: int) -> tuple[list[int], bool]:
+        # the first limit games by appid, so the same request always aggregates the same games.
+        # one extra is read to tell the caller whether the tag has more than that
+        cursor = self._collections.steam_apps_collection.find(
+            {'tags': tag}, {'_id': 0, 'appid': 1}, collation={'locale': 'en_US', 'strength': 2}
+        ).sort('appid', 1).limit(limit + 1)
+        appids = [game['appid'] async for game in cursor]
+        return appids[:limit], len(appids) > limit
+
+    async def get_top_snapshot(self) -> dict | None:
+        # the pointer: which top_games version readers should use and when it was published
+        snapshot = await self._collections.app_metadata.find_one({'operation': DBEnums.LAST_TOP_GAMES_UPDATE}, {'_id': 0})
+        return snapshot if snapshot and 'version' in snapshot else None
+
+    async def publish_top(self, games: list[dict]) -> int:
+        # write the new chart next to the current one, then flip the pointer in one update. readers see either the
+        # old list or the new one, never a half written one
+        previous = await self.get_top_snapshot()
+        version = time.time_ns()
+        await self._collections.top_games.insert_many(
+            [{**game, 'version': version, 'rank': rank} for rank, game in enumerate(games)]
+        )
+        await self._collections.app_metadata.update_one(
+            {'operation': DBEnums.LAST_TOP_GAMES_UPDATE},
+            {'$set': {'version': version, 'last_update': datetime.now()}},
+            upsert=True
+        )
+        # keep the previous version around for readers that fetched the old pointer a moment ago
+        keep = [version, previous['version']] if previous else [version]
+        await self._collections.top_games.delete_many({'version': {'$nin': keep}})
+        return version
+
+    async def acquire_lock(self, name: str, seconds: int) -> bool:
+        # cross-process mutex: a document with a fixed _id, taken when missing or expired
+        now = datetime.now()
+        try:
+            await self._collections.app_metadata.update_one(
+                {'_id': name, 'locked_until': {'$lt': now}},
+                {'$set': {'locked_until': now + timedelta(seconds=seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False # held by someone else, the upsert collided with the existing document
+
+    async def release_lock(self, name: str):
+        await self._collections.app_metadata.update_one({'_id': name}, {'$set': {'locked_until': datetime.min}})
+
+    async def delete_game(self, appid: int):
+        game = await self._collections.steam_apps_collection.find_one_and_delete({'appid': appid})
+        await self.update_facets(facet_deltas(game, None))
+        search_cache.invalidate()
+
+    def get_top(self, num_games: int, version: int):
+        return self._collections.top_games.find({'version': version}, {'_id': 0, 'version': 0, 'rank': 0}).sort('rank', 1).limit(num_games)
+
+    async def get_applist(self) -> list[tuple[int, str]]:
+        cursor = self._collections.applist.find({}, {'_id': 0, 'appid': 1, 'name': 1}).batch_size(10_000)
+        return [(app['appid'], app.get('name')) async for app in cursor]
+
+    def iter_applist_after(self, appid: int = 0):
+        return self._collections.applist.find({'appid': {'$gt': appid}}, {'_id': 0, 'appid': 1}).sort('appid', 1).batch_size(1000)
+
+    async def find_existing_appids(self, appids: list[int]) -> set[int]:
+        cursor = self._collections.steam_apps_collection.find({'appid': {'$in': appids}}, {'_id': 0, 'appid': 1})
+        return {game['appid'] async for game in cursor}
+
+    async def sync_applist(self, apps: AsyncIterator[dict], chunk_size: int = 5000) -> dict[str, int]:
+        # diff the incoming list against what's stored and write only the difference, the collection is never empty
+        stored = {app['appid']: app.get('name') async for app in self._collections.applist.find({}, {'_id': 0, 'appid': 1, 'name': 1})}
+        seen = set()
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        writes = []
+
+        async def _flush():
+            if writes:
+                await self._collections.applist.bulk_write(writes, ordered=False)
+                writes.clear()
+
+        async for app in apps:
+            appid, name = app['appid'], app['name']
+            if appid in seen:
+                continue # steam lists a few ids twice
+            seen.add(appid)
+
+            if appid not in stored:
+                counts['added'] += 1
+            elif stored.pop(appid) != name:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+
+            writes.append(UpdateOne({'appid': appid}, {'$set': {'name': name}}, upsert=True))
+            if len(writes) >= chunk_size:
+                await _flush()
+
+        removed = list(stored)
+        for start in range(0, len(removed), chunk_size):
+            writes.append(DeleteMany({'appid': {'$in': removed[start:start + chunk_size]}}))
+        counts['removed'] = len(removed)
+        await _flush()
+
+        if counts['added'] or counts['updated'] or counts['removed']:
+            await self._collections.app_metadata.update_one(
+                {'operation': DBEnums.APPLIST_VERSION},
+                {'$set': {'version': time.time_ns(), 'last_update': datetime.now()}},
+                upsert=True
+            )
+        return counts
+
+    async def get_applist_version(self) -> int | None:
+        # bumped by every sync_applist that changed something, workers compare it with the version their index holds
+        applist = await self._collections.app_metadata.find_one({'operation': DBEnums.APPLIST_VERSION}, {'_id': 0, 'version': 1})
+        return applist['version'] if applist else None
+
+    async def update_operation_time(self, operation: str):
+        await self._collections.app_metadata.update_one(
+        {'operation': operation},
+        {'$set': {'last_update': datetime.now()}},
+        upsert=True
+        )
+
+    async def get_checkpoint(self, operation: str) -> dict:
+        return await self._collections.app_metadata.find_one({'operation': operation}, {'_id': 0}) or {}
+
+    async def save_checkpoint(self, operation: str, fields: dict, failed: list[int] | None = None):
+        update = {'$set': {**fields, 'last_update': datetime.now()}}
+        if failed:
+            update['$addToSet'] = {'failed_appids': {'$each': failed}}
+        await self._collections.app_metadata.update_one({'operation': operation}, update, upsert=True)
+
+    async def should_update(self, operation: str, hours: int = 1) -> bool:
+        last_operation = await self._collections.app_metadata.find_one({
+            'operation': operation
+        })
+        if not last_operation:
+            return True
+
+        time_diff = datetime.now() - last_operation['last_update']
+        return time_diff.total_seconds() >= (hours * 3600)
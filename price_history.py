@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+# a price is a step function of time: it holds from the moment it was seen until the next change. only changes are
+# stored, as points in one bucket per app, edition and month that also keeps the price the month opened with
+
+INTERVALS = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+
+def local_naive(moment: datetime) -> datetime:
+    # points are written with a naive datetime.now(), bring client supplied aware times (e.g. ...Z) onto that clock
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday()) if interval == 'week' else day
+
+
+def price_changes(old: dict[str, float] | None, new: dict[str, float] | None) -> dict[str, float | None]:
+    # edition -> its new price, only for editions whose price moved. an edition that disappeared becomes None
+    old, new = old or {}, new or {}
+    changes = {edition: price for edition, price in new.items() if edition not in old or old[edition] != price}
+    changes.update({edition: None for edition in old if edition not in new})
+    return changes
+
+
+def price_writes(games: list[tuple[int, dict | None, dict | None]], now: datetime) -> list[UpdateOne]:
+    # (appid, old editions, new editions). only editions whose price moved get a point, in this month's bucket.
+    # a new bucket opens with the price the edition had before, so a range query never has to look further back
+    return [
+        UpdateOne(
+            {'appid': appid, 'edition': edition, 'month': month_start(now)},
+            {
+                '$setOnInsert': {'open': (old or {}).get(edition)},
+                '$push': {'points': {'at': now, 'price': price}},
+                '$set': {'close': price}
+            },
+            upsert=True
+        )
+        for appid, old, new in games
+        for edition, price in price_changes(old, new).items()
+    ]
+
+
+def period_stats(opening: float | None,
+                 points: list[tuple[datetime, float | None]],
+                 start: datetime,
+                 end: datetime,
+                 interval: str) -> dict[datetime, dict]:
+    # min and max of every price held during each period, avg weighted by how long it was held.
+    # time without a price (before the first point, after the edition went away) doesn't count
+    step = INTERVALS[interval]
+    price, index = opening, 0
+    while index < len(points) and points[index][0] <= start:
+        price = points[index][1]
+        index += 1
+
+    stats = {}
+    period = start
+    while period < end:
+        period_end = min(period + step, end)
+        held, weighted, seconds = [], 0.0, 0.0
+        cursor = period
+        while cursor < period_end:
+            change_at = points[index][0] if index < len(points) and points[index][0] < period_end else period_end
+            if price is not None and change_at > cursor:
+                held.append(price)
+                weighted += price * (change_at - cursor).total_seconds()
+                seconds += (change_at - cursor).total_seconds()
+            if change_at < period_end:
+                price = points[index][1]
+                index += 1
+            cursor = change_at
+
+        if held:
+            stats[period] = {'min': min(held), 'max': max(held), 'avg': round(weighted / seconds, 2)}
+        period = period_end
+    return stats
+
+
+def merge_stats(series: list[dict[datetime, dict]]) -> dict[datetime, dict]:
+    # many series (every edition of every game with a tag) into one row per period, each series weighs the same
+    merged: dict[datetime, dict] = {}
+    for stats in series:
+        for period, row in stats.items():
+            total = merged.setdefault(period, {'min': row['min'], 'max': row['max'], 'avg': 0.0, 'series': 0})
+            total['min'] = min(total['min'], row['min'])
+            total['max'] = max(total['max'], row['max'])
+            total['avg'] += row['avg']
+            total['series'] += 1
+    for total in merged.values():
+        total['avg'] = round(total['avg'] / total['series'], 2)
+    return dict(sorted(merged.items()))
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, Iterable
+
+
+class QueryCache:
+    # lru + ttl cache for query results. every write to the library bumps generation, a result computed
+    # under an older generation is never stored, and entries from older generations are never served
+
+    def __init__(self, max_entries: int = 1024, max_items: int = 50_000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.max_items = max_items # total cached documents across entries, that's what actually takes memory
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = 0
+        self._entries: OrderedDict[Hashable, tuple[float, int, list]] = OrderedDict()
+
+    @staticmethod
+    def make_key(verbatim: Iterable[str] = (), **params) -> tuple:
+        # same search, same key: drop unset params, lists become sorted sets, strings match case-insensitively like the
+        # collated queries do. verbatim params (regex patterns) keep their case, \w and \W are different searches
+        def _normalize(value: Any, fold: bool) -> Hashable:
+            if isinstance(value, (list, tuple, set)):
+                return tuple(sorted({_normalize(item, fold) for item in value}))
+            if isinstance(value, str):
+                return value.casefold() if fold else value
+            if isinstance(value, datetime):
+                return value.isoformat()
+            return value
+
+        return tuple(sorted(
+            (name, _normalize(value, name not in verbatim)) for name, value in params.items() if value is not None
+        ))
+
+    def get(self, key: Hashable) -> list | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != self.generation:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: Hashable, value: list, generation: int):
+        if generation != self.generation or len(value) > self.max_items:
+            return # the library changed while this was being computed
+
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, generation, value)
+        self._items += len(value)
+
+        while len(self._entries) > self.max_entries or self._items > self.max_items:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self):
+        self.generation += 1
+        self._entries.clear()
+        self._items = 0
+
+    def _drop(self, key: Hashable):
+        self._items -= len(self._entries.pop(key)[2])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'items': self._items,
+            'generation': self.generation
+        }
+
+
+search_cache = QueryCache()
@@ -1,5 +1,9 @@
 from datetime import datetime
-from pydantic import BaseModel
+from enum import StrEnum
+from typing import Annotated
+from pydantic import BaseModel, Field
+
+MAX_APPID = 2 ** 32 - 1 # steam appids are unsigned 32 bit
 
 class Game(BaseModel):
     appid: int
@@ -14,3 +18,46 @@ class GameMetadata(Game):
     tags: list[str] | None
     editions: dict[str, float] | None
     features: list[str] | None
+
+
+class ScoredGame(GameMetadata):
+
+    score: float
+
+
+class PricePeriod(BaseModel):
+
+    period: datetime
+    min: float
+    avg: float
+    max: float
+
+
+class TagPricePeriod(PricePeriod):
+
+    series: int
+
+
+class FacetCount(BaseModel):
+
+    value: str
+    count: int
+
+
+class AddStatus(StrEnum):
+
+    ADDED = 'added'
+    EXISTS = 'exists'
+    NOT_FOUND = 'not_found'
+    FAILED = 'failed'
+
+
+class BatchAdd(BaseModel):
+
+    appids: list[Annotated[int, Field(ge=0, le=MAX_APPID)]] = Field(min_length=1, max_length=1000)
+
+
+class BatchAddResult(BaseModel):
+
+    counts: dict[AddStatus, int]
+    results: dict[int, AddStatus]
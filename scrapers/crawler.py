@@ -0,0 +1,195 @@
+import time
+import asyncio
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from .http_client import close_http_client
+from .game_page_scraper import request_game_page, parse_game_page
+from mongo_db_processor import AsyncMongoRepository, DBEnums
+from schemas import GameMetadata
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PolitenessLimiter:
+    # one global pace for every worker: requests are spaced 1 / rate seconds apart
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class _Progress:
+    # appids are handed out in order but finish out of order, the checkpoint is the highest appid
+    # with everything at or below it finished, so a resumed run never skips one
+
+    def __init__(self, last_appid: int):
+        self.last_appid = last_appid
+        self.added = 0
+        self.missing = 0
+        self.skipped = 0
+        self.failed: list[int] = []
+        self.failed_total = 0
+        self._in_order: deque[int] = deque()
+        self._finished: set[int] = set()
+        self._started = time.monotonic()
+
+    def dispatched(self, appid: int):
+        self._in_order.append(appid)
+
+    def finished(self, appid: int):
+        self._finished.add(appid)
+        while self._in_order and self._in_order[0] in self._finished:
+            self._finished.remove(self._in_order[0])
+            self.last_appid = self._in_order.popleft()
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self._started
+        processed = self.added + self.missing + self.failed_total
+        return (f'checkpoint appid {self.last_appid} | added {self.added} | not a game {self.missing} | '
+                f'already stored {self.skipped} | failed {self.failed_total} | {processed / elapsed:.2f} pages/s')
+
+
+async def _fetch_page(appid: int, limiter: PolitenessLimiter, retries: int, backoff: float) -> str | None:
+    for attempt in range(retries + 1):
+        await limiter.wait()
+        try:
+            resp, html = await request_game_page(appid)
+            if resp.status_code not in RETRY_STATUSES:
+                return html
+        except httpx.TransportError:
+            pass
+
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+    raise Exception(f'Gave up on app {appid} after {retries + 1} attempts')
+
+
+async def crawl(concurrency: int = 8,
+                rate: float = 2.0,
+                processes: int | None = None,
+                retries: int = 3,
+                backoff: float = 2.0,
+                batch_size: int = 50,
+                report_every: float = 10.0,
+                limit: int | None = None,
+                restart: bool = False) -> _Progress:
+    repository = AsyncMongoRepository()
+    checkpoint = {} if restart else await repository.get_checkpoint(DBEnums.BACKFILL_CRAWL)
+    progress = _Progress(checkpoint.get('last_appid', 0))
+    limiter = PolitenessLimiter(rate)
+    queue: asyncio.Queue[int | None] = asyncio.Queue(maxsize=concurrency * 2)
+    buffer: list[dict] = []
+    loop = asyncio.get_running_loop()
+
+    save_lock = asyncio.Lock()
+
+    async def _save():
+        # only checkpoint what's actually written: every appid up to last_appid is in the buffer or already saved
+        async with save_lock:
+            last_appid, games, failed = progress.last_appid, buffer.copy(), progress.failed
+            buffer.clear()
+            progress.failed = []
+            if games:
+                await repository.add_games(games)
+            await repository.save_checkpoint(DBEnums.BACKFILL_CRAWL, {'last_appid': last_appid}, failed)
+
+    async def _produce():
+        dispatched = 0
+        batch = []
+
+        async def _dispatch():
+            nonlocal dispatched
+            existing = await repository.find_existing_appids(batch)
+            for appid in batch:
+                progress.dispatched(appid)
+                if appid in existing:
+                    progress.skipped += 1
+                    progress.finished(appid)
+                else:
+                    await queue.put(appid)
+                    dispatched += 1
+            batch.clear()
+
+        async for app in repository.iter_applist_after(progress.last_appid):
+            if limit is not None and dispatched + len(batch) >= limit:
+                break
+            batch.append(app['appid'])
+            if len(batch) >= 500:
+                await _dispatch()
+        if batch:
+            await _dispatch()
+
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def _work(pool: ProcessPoolExecutor):
+        while (appid := await queue.get()) is not None:
+            try:
+                html = await _fetch_page(appid, limiter, retries, backoff)
+                if html is None:
+                    progress.missing += 1
+                else:
+                    # bs4 is cpu bound, the process pool keeps every core busy instead of one
+                    game: GameMetadata = await loop.run_in_executor(pool, parse_game_page, appid, html)
+                    buffer.append(game.model_dump())
+                    progress.added += 1
+            except Exception:
+                progress.failed.append(appid)
+                progress.failed_total += 1
+
+            progress.finished(appid)
+            if len(buffer) >= batch_size:
+                await _save()
+
+    async def _report():
+        while True:
+            await asyncio.sleep(report_every)
+            print(progress.report(), flush=True)
+            await _save()
+
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        reporter = asyncio.create_task(_report())
+        try:
+            await asyncio.gather(_produce(), *(_work(pool) for _ in range(concurrency)))
+        finally:
+            reporter.cancel()
+            await _save()
+            await close_http_client()
+
+    print(progress.report(), flush=True)
+    return progress
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Scrape every app of the applist collection into steam_apps, resumable')
+    arg_parser.add_argument('--concurrency', type=int, default=8, help='pages fetched at once')
+    arg_parser.add_argument('--rate', type=float, default=2.0, help='max store requests per second, across all workers')
+    arg_parser.add_argument('--processes', type=int, default=None, help='html parsing processes, defaults to cpu count')
+    arg_parser.add_argument('--retries', type=int, default=3)
+    arg_parser.add_argument('--limit', type=int, default=None, help='stop after this many pages')
+    arg_parser.add_argument('--restart', action='store_true', help='ignore the saved checkpoint')
+    args = arg_parser.parse_args()
+
+    asyncio.run(crawl(
+        concurrency=args.concurrency,
+        rate=args.rate,
+        processes=args.processes,
+        retries=args.retries,
+        limit=args.limit,
+        restart=args.restart
+    ))
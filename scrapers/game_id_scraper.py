@@ -1,5 +1,35 @@
+import ijson
+import httpx
 import requests
 
+from .http_client import get_http_client
+from settings import STEAM_API_URL
+
+APPLIST_URL = STEAM_API_URL + '/ISteamApps/GetAppList/v2'
+
 def scrape_ids():
-    response = requests.get('https://api.steampowered.com/ISteamApps/GetAppList/v2', timeout=10).json()
+    response = requests.get(APPLIST_URL, timeout=10).json()
     return response['applist']
+
+
+class _ResponseReader:
+    # ijson wants a file-like object with an async read(), feed it the body chunk by chunk
+
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b'' # ijson probes with read(0) to tell bytes from str
+        try:
+            return await anext(self._chunks)
+        except StopAsyncIteration:
+            return b''
+
+
+async def stream_applist():
+    # yields {'appid', 'name'} as the ~250k entry list downloads, never holding the whole document
+    async with get_http_client().stream('GET', APPLIST_URL, timeout=30) as response:
+        response.raise_for_status()
+        async for app in ijson.items(_ResponseReader(response), 'applist.apps.item'):
+            yield app
@@ -1,33 +1,31 @@
 import re
+import asyncio
 from datetime import datetime
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import PageElement
 
+from metrics import SCRAPE_LATENCY
 from schemas import GameMetadata
+from settings import STEAM_STORE_URL
+from .http_client import get_http_client
+from .page_cache import get_page_cache
 
 class PageScraper:
 
-    STEAM_URL = 'https://store.steampowered.com/app/{appid}'
+    STEAM_URL = STEAM_STORE_URL + '/app/{appid}'
 
-    def __init__(self, appid: int):
-        self.appid = appid
-        self.soup = None
-        self._fetch_page()
-
-    def _fetch_page(self):
-
-        def _is_parsed():
-            return self.soup is not None
+    # only the sections the get_* methods read get built into the tree, everything inside a kept section stays whole.
+    # regex because the strainer sees the raw class attribute, e.g. 'game_area_purchase_game_wrapper dynamic_bundle'
+    PARSE_ONLY = SoupStrainer('div', class_=re.compile(
+        r'(^|\s)(apphub_AppName|game_description_snippet|glance_details|glance_ctn|date|glance_ctn_responsive_left|rightcol'
+        r'|game_area_purchase_game_wrapper|game_area_purchase|game_area_features_list_ctn)(\s|$)'
+    ))
 
-        try:
-            resp = requests.get(self.STEAM_URL.format(appid=self.appid), timeout=10).text
-            self.soup = BeautifulSoup(resp, 'html.parser')
-            if not _is_parsed():
-                raise requests.exceptions.Timeout()
-        except (requests.ConnectionError, requests.ConnectTimeout) as bad_connection:
-            raise Exception from bad_connection
+    def __init__(self, appid: int, html: str, parser: str = 'lxml', parse_only: SoupStrainer | None = PARSE_ONLY):
+        self.appid = appid
+        self.soup = BeautifulSoup(html, parser, parse_only=parse_only)
 
     def get_title(self) -> str:
         return self.soup.find('div', class_='apphub_AppName').text
@@ -125,24 +123,75 @@ class PageScraper:
         return game_features
 
 
-def validate_game(gameid) -> bool:
-    resp = requests.get(f'https://store.steampowered.com/app/{gameid}', timeout=10).url
-    return f'/app/{gameid}' in resp
-
-
-def get_game_info(appid):
-    if validate_game(appid):
-        parser = PageScraper(appid=appid)
-        game = GameMetadata(
-            appid=appid,
-            title=parser.get_title(),
-            description=parser.get_description(),
-            release_date=parser.get_release_date(),
-            developers=parser.get_developers(),
-            tags=parser.get_tags(),
-            editions=parser.get_editions(),
-            features=parser.get_game_features()
-        )
-        return game
+class StorePageUnavailable(Exception):
+    # steam answered with something other than a page, e.g. 429 or 503. unlike an unknown appid it's worth retrying
+    pass
+
+
+def validate_game(gameid, page_url) -> bool:
+    # steam redirects unknown ids to the store front page
+    return f'/app/{gameid}' in str(page_url)
+
+
+async def request_game_page(appid) -> tuple[httpx.Response, str | None]:
+    # conditional get against the cached copy: an unchanged page comes back as an empty 304 and is read from disk.
+    # returns the response (for its status) and the page html, None when it isn't a game page
+    page_cache = get_page_cache()
+    cached = await asyncio.to_thread(page_cache.lookup, appid) if page_cache else None
+    url = PageScraper.STEAM_URL.format(appid=appid)
+
+    resp = await get_http_client().get(url, headers=cached.validators if cached else None)
+    if resp.status_code == 304 and cached:
+        html = await asyncio.to_thread(page_cache.read, cached, False)
+        if html is not None:
+            await asyncio.to_thread(page_cache.revalidate, appid)
+            return resp, html
+        resp = await get_http_client().get(url) # the blob got evicted under us, fetch it whole
+
+    if resp.status_code != 200 or not validate_game(appid, resp.url):
+        return resp, None
+    html = resp.text
+    if page_cache:
+        await asyncio.to_thread(page_cache.store, appid, html, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+    return resp, html
+
+
+async def fetch_game_page(appid) -> str | None:
+    try:
+        with SCRAPE_LATENCY.labels('fetch').time():
+            resp, html = await request_game_page(appid)
+    except httpx.TransportError as bad_connection:
+        raise Exception from bad_connection
+    # unknown appids redirect to the store front (a 200 that isn't a game page) or 404, both are a plain None
+    if html is None and resp.status_code not in (200, 404):
+        raise StorePageUnavailable(f'app {appid}: steam answered {resp.status_code}')
+    return html
+
+
+def parse_game_page(appid, html: str, **scraper_options) -> GameMetadata:
+    with SCRAPE_LATENCY.labels('parse').time():
+        parser = PageScraper(appid=appid, html=html, **scraper_options)
+
+    extractors = {
+        'title': parser.get_title,
+        'description': parser.get_description,
+        'release_date': parser.get_release_date,
+        'developers': parser.get_developers,
+        'tags': parser.get_tags,
+        'editions': parser.get_editions,
+        'features': parser.get_game_features
+    }
+    fields = {}
+    for field, extract in extractors.items():
+        with SCRAPE_LATENCY.labels(extract.__name__).time():
+            fields[field] = extract()
+    return GameMetadata(appid=appid, **fields)
+
+
+async def get_game_info(appid):
+    html = await fetch_game_page(appid)
+    if html is not None:
+        # parsing a store page is cpu bound, don't stall the event loop with it
+        return await asyncio.to_thread(parse_game_page, appid, html)
     else:
         return None
@@ -0,0 +1,23 @@
+import httpx
+
+# one pooled client per process, so store pages reuse keep-alive (and h2) connections instead of a new TLS handshake per call
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=httpx.Timeout(10),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=30)
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
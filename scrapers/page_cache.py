@@ -0,0 +1,181 @@
+import gzip
+import os
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from settings import PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB
+
+# raw store pages on disk, so unchanged pages cost a 304 and steam_apps can be rebuilt from them without the network.
+# blobs are gzipped and named by the sha256 of the page, appids that serve the same page share one blob.
+# a small sqlite index maps appid -> blob plus the validators steam sent with it
+
+
+class CachedPage(NamedTuple):
+    appid: int
+    digest: str
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+    @property
+    def validators(self) -> dict[str, str]:
+        # headers for a conditional get, steam answers 304 when the page is unchanged
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS pages (
+            appid INTEGER PRIMARY KEY,
+            digest TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL,
+            used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pages_used_at ON pages (used_at);
+        CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest);
+        CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL
+        );
+    '''
+
+    def __init__(self, root: str | Path, max_bytes: int, compresslevel: int = 6):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.compresslevel = compresslevel
+        self.root.mkdir(parents=True, exist_ok=True)
+        # the api and the crawler reach it from worker threads, one connection behind a lock is plenty for this
+        self._db = sqlite3.connect(self.root / 'index.sqlite3', check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(self._SCHEMA)
+        self._lock = threading.Lock()
+        # running total of blob bytes, other processes sharing the directory make it drift so evict() recounts
+        self._bytes = self._size()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f'{digest}.html.gz'
+
+    def lookup(self, appid: int) -> CachedPage | None:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT appid, digest, etag, last_modified, fetched_at FROM pages WHERE appid = ?', (appid,)
+            ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def read(self, page: CachedPage, touch: bool = True) -> str | None:
+        try:
+            html = gzip.decompress(self._blob_path(page.digest).read_bytes()).decode()
+        except FileNotFoundError:
+            return None # evicted by another process since the lookup
+        if touch:
+            self.touch(page.appid)
+        return html
+
+    def touch(self, appid: int):
+        with self._lock:
+            self._db.execute('UPDATE pages SET used_at = ? WHERE appid = ?', (time.time(), appid))
+
+    def revalidate(self, appid: int):
+        # steam answered 304: the copy we hold is as fresh as a new download would be
+        now = time.time()
+        with self._lock:
+            self._db.execute('UPDATE pages SET fetched_at = ?, used_at = ? WHERE appid = ?', (now, now, appid))
+
+    def store(self, appid: int, html: str, etag: str | None = None, last_modified: str | None = None) -> CachedPage:
+        raw = html.encode()
+        digest = sha256(raw).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp.write_bytes(gzip.compress(raw, self.compresslevel))
+            os.replace(tmp, path) # readers never see half a blob
+
+        with self._lock:
+            previous = self._db.execute('SELECT digest FROM pages WHERE appid = ?', (appid,)).fetchone()
+            size = path.stat().st_size
+            if self._db.execute('INSERT OR IGNORE INTO blobs (digest, size) VALUES (?, ?)', (digest, size)).rowcount:
+                self._bytes += size
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages (appid, digest, etag, last_modified, fetched_at, used_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (appid, digest, etag, last_modified, now, now)
+            )
+            if previous and previous[0] != digest:
+                self._drop_unreferenced([previous[0]])
+            over = self._bytes > self.max_bytes
+
+        if over:
+            self.evict()
+        return CachedPage(appid, digest, etag, last_modified, now)
+
+    def _size(self) -> int:
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
+    def _drop_unreferenced(self, digests: list[str]):
+        for digest in digests:
+            if self._db.execute('SELECT 1 FROM pages WHERE digest = ? LIMIT 1', (digest,)).fetchone() is None:
+                size = self._db.execute('DELETE FROM blobs WHERE digest = ? RETURNING size', (digest,)).fetchone()
+                self._bytes -= size[0] if size else 0
+                self._blob_path(digest).unlink(missing_ok=True)
+
+    def evict(self, target: float = 0.9) -> int:
+        # least recently used pages first, down to target * max_bytes so we don't evict again on the next store.
+        # candidates come 100 at a time but go one by one, a page only frees bytes once its blob is unreferenced
+        evicted = 0
+        with self._lock:
+            self._bytes = self._size()
+            while self._bytes > self.max_bytes * target:
+                rows = self._db.execute('SELECT appid, digest FROM pages ORDER BY used_at LIMIT 100').fetchall()
+                if not rows:
+                    break
+                self._db.execute('BEGIN')
+                try:
+                    for appid, digest in rows:
+                        self._db.execute('DELETE FROM pages WHERE appid = ?', (appid,))
+                        self._drop_unreferenced([digest])
+                        evicted += 1
+                        if self._bytes <= self.max_bytes * target:
+                            break
+                finally:
+                    self._db.execute('COMMIT')
+        return evicted
+
+    def entries(self) -> Iterator[CachedPage]:
+        with self._lock:
+            rows = self._db.execute('SELECT appid, digest, etag, last_modified, fetched_at FROM pages ORDER BY appid').fetchall()
+        return (CachedPage(*row) for row in rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages, blobs = self._db.execute('SELECT (SELECT COUNT(*) FROM pages), (SELECT COUNT(*) FROM blobs)').fetchone()
+            self._bytes = self._size()
+        return {'pages': pages, 'blobs': blobs, 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_page_cache: PageCache | None = None
+
+
+def get_page_cache() -> PageCache | None:
+    # one per process, opened on first use. None when PAGE_CACHE_DIR is empty
+    global _page_cache
+    if _page_cache is None and PAGE_CACHE_DIR:
+        _page_cache = PageCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB * 1024 * 1024)
+    return _page_cache
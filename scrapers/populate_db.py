@@ -1,96 +1,155 @@
-import re
 import time
+import asyncio
+from datetime import datetime, timedelta
 
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-
+from .crawler import PolitenessLimiter
 from .game_page_scraper import get_game_info
-from mongo_db_processor import MongoRepository, DBEnums
+from .top_sellers import get_top_sellers_source
+from mongo_db_processor import AsyncMongoRepository, DBEnums
+from query_cache import search_cache
 from schemas import GameMetadata, Game
+from settings import SCRAPE_CONCURRENCY, SCRAPE_RATE
 
 
-class WebDriver: #requests can't load js so i had to use selenium
-
-    def __init__(self):
-        self._webdriver = None
-
-    def __enter__(self):
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--disable-logging')
-        self._webdriver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        return self._webdriver
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._webdriver.quit()
-        self._webdriver = None
-
-
-class Parser:
-
-    _STEAM_TOP_URL = 'https://store.steampowered.com/charts/topselling/global'
-
-    def _get_page_source(self):
-        page_source = None
-        with WebDriver() as driver:
-            driver.get(self._STEAM_TOP_URL)
-            time.sleep(5) #idk native wait doesn't wait and wait.until doesn't either
-            page_source = driver.page_source
-        return page_source
+repository = AsyncMongoRepository()
+top_sellers_source = get_top_sellers_source()
+# shared by every request in the process, a few batch adds at once still hit steam at one steady pace
+_scrape_slots = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+_scrape_pace = PolitenessLimiter(SCRAPE_RATE)
 
-    def format_app_ids(self, num_games: int) -> list[Game]:
-        html = self._get_page_source()
-        apps = re.findall(r'app/\d+/\w+', html)
+REFRESH_EVERY = timedelta(hours=1)
+REFRESH_LOCK_SECONDS = 300
+LOCK_RETRY = 5 # secs a waiting worker polls the pointer between attempts at the refresh lock
+COLD_START_WAIT = 30 # secs a request waits for the very first chart before answering with nothing
+SNAPSHOT_RECHECK = 60 # secs between pointer checks, how long another worker's publish can go unnoticed
+CHART_SIZE = 99
+_refresh_task: asyncio.Task | None = None
 
-        game_ids = []
-        for app in apps:
-            _, appid, app_name = app.replace('_', ' ').split('/') # returns ['app', '730', 'CounterStrike 2']
 
-            if appid == '1675200': #steam deck id
-                continue
+class _TopGamesCache:
+    # everything derived from one snapshot version. a new version gets a new object, so a request that started
+    # on the old one never writes into the new one
 
-            game_ids.append(Game(
-                appid=appid,
-                title=app_name
-            ))
+    __slots__ = ('snapshot', 'checked_at', 'games', 'metadata', 'covered', 'generation')
 
-            if len(game_ids) >= num_games:
-                break
+    def __init__(self, snapshot: dict | None = None):
+        self.snapshot = snapshot
+        self.checked_at = time.monotonic()
+        self.games: list[Game] | None = None
+        self.metadata: dict[int, GameMetadata] = {}
+        self.covered = 0 # how many chart entries metadata was looked up for
+        self.generation = -1 # search_cache generation metadata was read under, any library write drops it
 
-        return game_ids
 
+_cache = _TopGamesCache()
 
-repository = MongoRepository()
 
-def top_games(num_games: int) -> list[Game]:
-    if repository.should_update(DBEnums.LAST_TOP_GAMES_UPDATE):
-        repository.clear_top()
-        apps = Parser().format_app_ids(99) # just get all games, then strip whatever they want
-
-        for app in apps:
-            repository.add_to_top(app.model_dump())
-
-        repository.update_operation_time(DBEnums.LAST_TOP_GAMES_UPDATE)
-        return apps[0:num_games]
+async def current_snapshot() -> dict | None:
+    global _cache
+    if _cache.snapshot is not None and time.monotonic() - _cache.checked_at < SNAPSHOT_RECHECK:
+        return _cache.snapshot
 
+    snapshot = await repository.get_top_snapshot()
+    if snapshot is None or _cache.snapshot is None or snapshot['version'] != _cache.snapshot['version']:
+        _cache = _TopGamesCache(snapshot)
     else:
-        return [Game(**app) for app in repository.get_top(num_games)]
-
-def top_games_metadata(num_games: int) -> list[GameMetadata]:
-    games = top_games(num_games)
-    games_metadata = []
-
-    for game in games:
-        db_game = repository.find_game({'appid': game.appid})
-        game_to_add = None
-
-        if db_game:
-            game_to_add = GameMetadata(**db_game)
-        else:
-            game_to_add = get_game_info(game.appid)
-            repository.add_game(game_to_add.model_dump())
-
-        games_metadata.append(game_to_add)
-
-    return games_metadata
+        _cache.snapshot, _cache.checked_at = snapshot, time.monotonic()
+    return snapshot
+
+
+async def _refresh_top_games():
+    # one worker refreshes, the rest wait for its pointer flip instead of scraping the chart themselves.
+    # waiters keep this task alive, so stale reads here don't pile onto the lock, and retry the lock every
+    # LOCK_RETRY seconds: a holder that failed releases it, one that died lets it expire
+    seen = _cache.snapshot['version'] if _cache.snapshot else None
+    while True:
+        if await repository.acquire_lock(DBEnums.TOP_GAMES_REFRESH_LOCK, REFRESH_LOCK_SECONDS):
+            try:
+                apps = await top_sellers_source.fetch(CHART_SIZE) # just get all games, then strip whatever they want
+                await repository.publish_top([app.model_dump() for app in apps])
+                # this worker sees its own publish right away, the others on their next pointer check
+                _cache.checked_at = float('-inf')
+            finally:
+                await repository.release_lock(DBEnums.TOP_GAMES_REFRESH_LOCK)
+            return
+
+        for _ in range(LOCK_RETRY * 2):
+            snapshot = await repository.get_top_snapshot()
+            if snapshot and snapshot['version'] != seen:
+                _cache.checked_at = float('-inf')
+                return
+            await asyncio.sleep(0.5)
+
+
+def refresh_top_games() -> asyncio.Task:
+    # single flight within the process: every caller shares the running refresh
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_top_games())
+        # a failed background refresh just leaves the old snapshot up, the next stale read retries
+        _refresh_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return _refresh_task
+
+
+async def top_games(num_games: int) -> list[Game]:
+    snapshot = await current_snapshot()
+
+    if snapshot is None:
+        # nothing to serve yet, this one has to wait. the refresh carries on in the background after a timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(refresh_top_games()), COLD_START_WAIT)
+        except asyncio.TimeoutError:
+            pass
+        snapshot = await current_snapshot()
+        if snapshot is None:
+            return []
+    elif datetime.now() - snapshot['last_update'] >= REFRESH_EVERY:
+        # stale while revalidate: answer from the current snapshot, swap in the new one in the background
+        refresh_top_games()
+
+    cache = _cache
+    if cache.games is None:
+        # the whole chart once per version, every num_games is a slice of it
+        cache.games = [Game(**app) async for app in repository.get_top(CHART_SIZE, snapshot['version'])]
+    return cache.games[:num_games]
+
+async def scrape_game(appid: int) -> GameMetadata | None:
+    async with _scrape_slots:
+        await _scrape_pace.wait()
+        return await get_game_info(appid)
+
+async def scrape_all(appids: list[int]) -> list[GameMetadata | None | BaseException]:
+    # one result per appid, in order: the game, None when steam doesn't know it, or the exception the scrape raised
+    return await asyncio.gather(*(scrape_game(appid) for appid in appids), return_exceptions=True)
+
+async def scrape_games(appids: list[int]) -> dict[int, GameMetadata]:
+    results = await scrape_all(appids)
+    # games that failed to scrape or don't exist are just left out
+    return {appid: game for appid, game in zip(appids, results) if isinstance(game, GameMetadata)}
+
+async def top_games_metadata(num_games: int) -> list[GameMetadata]:
+    games = await top_games(num_games)
+    cache = _cache
+    appids = [game.appid for game in games]
+
+    if cache.generation != search_cache.generation or cache.covered < len(appids):
+        generation = search_cache.generation
+        games_metadata = {game['appid']: GameMetadata(**game) async for game in repository.find_games_by_appids(appids)}
+        missing = [appid for appid in dict.fromkeys(appids) if appid not in games_metadata]
+
+        covered = len(appids)
+        if missing:
+            results = dict(zip(missing, await scrape_all(missing)))
+            scraped = {appid: game for appid, game in results.items() if isinstance(game, GameMetadata)}
+            if scraped:
+                await repository.add_games([game.model_dump() for game in scraped.values()])
+                generation = search_cache.generation # our own insert, what we hold is already up to date
+            games_metadata.update(scraped)
+            # covered stops before the first failed scrape (429, timeout), the next call tries it again.
+            # None is steam not knowing the app, nothing to retry there
+            failed = [position for position, appid in enumerate(appids) if isinstance(results.get(appid), BaseException)]
+            covered = failed[0] if failed else covered
+
+        cache.metadata, cache.covered, cache.generation = games_metadata, covered, generation
+
+    return [cache.metadata[appid] for appid in appids if appid in cache.metadata]
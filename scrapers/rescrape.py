@@ -0,0 +1,170 @@
+import math
+import heapq
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+from .http_client import close_http_client
+from .populate_db import scrape_all
+from facets import facet_deltas
+from mongo_db_processor import AsyncMongoRepository, DBEnums, price_fields
+from schemas import GameMetadata
+from settings import RESCRAPE_PER_HOUR, RESCRAPE_MAX_AGE_HOURS
+
+# stored games go stale: prices, tags and features change on steam. the scheduler re-scrapes the most overdue ones
+# within a fixed hourly budget, top sellers and often requested games become due sooner
+
+demand: Counter[int] = Counter() # appid -> requests since the last flush, filled by the api routes
+MAX_DEMAND_ENTRIES = 10_000 # distinct appids held between two flushes, any client can make up appids
+
+
+def record_demand(appid: int):
+    if appid in demand or len(demand) < MAX_DEMAND_ENTRIES:
+        demand[appid] += 1
+
+
+def priority(age: timedelta, max_age: timedelta, rank: int | None = None, chart_size: int = 99,
+             hits: int = 0, top_weight: float = 4.0) -> float:
+    # due once this reaches 1: a plain game after max_age, the #1 seller 1 + top_weight times sooner,
+    # every doubling of requests since the last scrape pulls it in a bit more
+    weight = 1 + math.log1p(hits)
+    if rank is not None:
+        weight += top_weight * (1 - rank / chart_size)
+    return age / max_age * weight
+
+
+def retry_delay(failures: int, max_age: timedelta, base: timedelta = timedelta(minutes=15)) -> timedelta:
+    # after a failed scrape: 15 minutes, then 30, an hour... never longer than a fresh game waits anyway
+    return min(base * 2 ** min(failures, 16), max_age)
+
+
+class RescrapeScheduler:
+
+    def __init__(self,
+                 repository: AsyncMongoRepository,
+                 per_hour: int = RESCRAPE_PER_HOUR,
+                 max_age: timedelta = timedelta(hours=RESCRAPE_MAX_AGE_HOURS),
+                 tick: float = 60,
+                 candidates: int = 1000,
+                 verbose: bool = False):
+        self.repository = repository
+        self.per_hour = per_hour
+        self.max_age = max_age
+        self.tick = tick
+        self.candidates = candidates
+        self.verbose = verbose
+        self._allowance = 0.0
+
+    async def _flush_demand(self):
+        if demand:
+            counts = dict(demand)
+            demand.clear()
+            await self.repository.record_demand(counts)
+
+    async def plan(self, budget: int) -> list[int]:
+        now = datetime.now()
+        games = {}
+        # oldest first by scraped_at, plus everything requested since its last scrape, which may not be that old yet
+        async for game in self.repository.stale_games(now - self.max_age / 8, self.candidates):
+            games[game['appid']] = game
+        async for game in self.repository.demanded_games(self.candidates):
+            games[game['appid']] = game
+
+        chart = {}
+        if snapshot := await self.repository.get_top_snapshot():
+            top = [game['appid'] async for game in self.repository.get_top(99, snapshot['version'])]
+            chart = {appid: rank for rank, appid in enumerate(top)}
+            projection = {'_id': 0, 'appid': 1, 'scraped_at': 1, 'demand': 1, 'retry_at': 1}
+            async for game in self.repository.find_games_by_appids(list(chart), projection):
+                if not game.get('retry_at') or game['retry_at'] <= now:
+                    games[game['appid']] = game
+
+        due = []
+        for appid, game in games.items():
+            age = now - game['scraped_at'] if game.get('scraped_at') else self.max_age * 100
+            score = priority(age, self.max_age, chart.get(appid), max(len(chart), 1), game.get('demand', 0))
+            if score >= 1:
+                due.append((score, appid))
+        return [appid for _, appid in heapq.nlargest(budget, due)]
+
+    async def run_once(self, budget: int) -> dict[str, int]:
+        appids = await self.plan(budget)
+        if not appids:
+            return {'scraped': 0, 'changed': 0, 'failed': 0}
+
+        results = await scrape_all(appids)
+        stored = {game['appid']: game async for game in self.repository.find_games_by_appids(appids)}
+
+        now = datetime.now()
+        updates = {}
+        retries = {}
+        prices = []
+        facets = Counter()
+        for appid, game in zip(appids, results):
+            if appid not in stored:
+                continue # deleted since plan()
+            if isinstance(game, BaseException):
+                # steam hiccup, 429 or a page we couldn't parse: stays stale, tried again after a backoff
+                retries[appid] = now + retry_delay(stored[appid].get('scrape_failures', 0), self.max_age)
+                continue
+            if game is None:
+                updates[appid] = {} # gone from the store, nothing to re-scrape until max_age again
+                continue
+            fresh = game.model_dump()
+            fresh.update(price_fields(fresh['editions']))
+            updates[appid] = {field: value for field, value in fresh.items() if stored[appid].get(field) != value}
+            if 'editions' in updates[appid]:
+                prices.append((appid, stored[appid].get('editions'), fresh['editions']))
+            facets.update(facet_deltas(stored[appid], fresh))
+
+        await self.repository.mark_scraped(updates)
+        await self.repository.mark_failed(retries)
+        await self.repository.record_price_changes(prices)
+        await self.repository.update_facets(facets)
+        return {
+            'scraped': sum(1 for game in results if isinstance(game, GameMetadata)),
+            'changed': sum(1 for fields in updates.values() if fields),
+            'failed': len(retries)
+        }
+
+    async def run(self):
+        # every api worker runs this, even with per_hour at 0: demand counts get flushed either way, so a scheduler
+        # running elsewhere (python -m scrapers.rescrape) sees them. only the worker holding the lock spends the budget
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self._flush_demand()
+                if not self.per_hour or not await self.repository.acquire_lock(DBEnums.RESCRAPE_LOCK, int(self.tick * 0.9)):
+                    continue
+                # unspent budget carries over one tick at most, so the hourly rate is a ceiling
+                per_tick = self.per_hour * self.tick / 3600
+                self._allowance = min(self._allowance + per_tick, max(per_tick, 1))
+                if budget := int(self._allowance):
+                    result = await self.run_once(budget)
+                    self._allowance -= budget
+                    if self.verbose:
+                        print(f"rescrape: {result['scraped']} scraped, {result['changed']} changed, {result['failed']} failed", flush=True)
+            except Exception as error:
+                if self.verbose:
+                    print(f'rescrape tick failed: {error!r}', flush=True) # next tick tries again
+
+
+async def main(per_hour: int, once: bool):
+    scheduler = RescrapeScheduler(AsyncMongoRepository(), per_hour, verbose=True)
+    try:
+        if once:
+            print(await scheduler.run_once(max(1, per_hour // 60)))
+        else:
+            await scheduler.run()
+    finally:
+        await close_http_client()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Re-scrape stale games in steam_apps within an hourly budget')
+    arg_parser.add_argument('--per-hour', type=int, default=RESCRAPE_PER_HOUR or 600, help='max store pages fetched per hour')
+    arg_parser.add_argument('--once', action='store_true', help='run a single one minute round and exit')
+    args = arg_parser.parse_args()
+
+    asyncio.run(main(args.per_hour, args.once))
@@ -0,0 +1,162 @@
+import re
+import json
+import queue
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Protocol
+
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from .http_client import get_http_client
+from metrics import SCRAPE_LATENCY
+from schemas import Game
+from settings import STEAM_API_URL, STEAM_STORE_URL, TOP_SELLERS_SOURCE
+
+STEAM_DECK_APPID = 1675200 # hardware, not a game
+
+
+class TopSellersSource(Protocol):
+
+    async def fetch(self, num_games: int) -> list[Game]: ...
+
+    async def aclose(self): ...
+
+
+class HttpTopSellersSource:
+    # the charts page is just a react shell around this web api call, ask it directly
+
+    def __init__(self, base_url: str = STEAM_API_URL):
+        self.url = base_url + '/IStoreTopSellersService/GetWeeklyTopSellers/v1/'
+
+    async def fetch(self, num_games: int) -> list[Game]:
+        request = {
+            'context': {'language': 'english'},
+            'data_request': {'include_basic_info': True},
+            'page_start': 0,
+            'page_count': num_games + 1 # room for the steam deck
+        }
+        with SCRAPE_LATENCY.labels('top_sellers_api').time():
+            resp = await get_http_client().get(self.url, params={'input_json': json.dumps(request)})
+        resp.raise_for_status()
+
+        games = []
+        for rank in resp.json()['response']['ranks']:
+            if rank['appid'] == STEAM_DECK_APPID:
+                continue
+            games.append(Game(appid=rank['appid'], title=rank.get('item', {}).get('name')))
+            if len(games) >= num_games:
+                break
+        return games
+
+    async def aclose(self):
+        pass
+
+
+class BrowserPool:
+    # chrome instances that stay up between refreshes, created on demand up to size
+
+    _driver_path: str | None = None
+
+    def __init__(self, size: int = 1):
+        self._size = size
+        self._created = 0
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _new_driver(self) -> webdriver.Chrome:
+        if BrowserPool._driver_path is None:
+            BrowserPool._driver_path = ChromeDriverManager().install()
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--disable-logging')
+        return webdriver.Chrome(service=Service(BrowserPool._driver_path), options=options)
+
+    @contextmanager
+    def acquire(self):
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._size
+                if create:
+                    self._created += 1
+            driver = self._new_driver() if create else self._idle.get()
+
+        try:
+            yield driver
+        except WebDriverException:
+            # a crashed browser doesn't go back to the pool
+            driver.quit()
+            with self._lock:
+                self._created -= 1
+            raise
+        self._idle.put(driver)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+class BrowserTopSellersSource: # fallback for when the web api stops answering, renders the chart like a user would
+
+    _STEAM_TOP_URL = STEAM_STORE_URL + '/charts/topselling/global'
+
+    def __init__(self, pool: BrowserPool | None = None, timeout: float = 15):
+        self._pool = pool or BrowserPool()
+        self._timeout = timeout
+
+    @SCRAPE_LATENCY.labels('top_sellers_page_source').time()
+    def _get_page_source(self, num_games: int) -> str:
+        with self._pool.acquire() as driver:
+            driver.get(self._STEAM_TOP_URL)
+            try:
+                # the rows render client side, wait until there are enough of them instead of sleeping
+                WebDriverWait(driver, self._timeout).until(
+                    lambda driver: len(driver.find_elements(By.CSS_SELECTOR, 'a[href*="/app/"]')) > num_games
+                )
+            except TimeoutException:
+                pass # parse whatever made it onto the page
+            return driver.page_source
+
+    def format_app_ids(self, num_games: int) -> list[Game]:
+        html = self._get_page_source(num_games)
+        apps = re.findall(r'app/\d+/\w+', html)
+
+        game_ids = []
+        for app in apps:
+            _, appid, app_name = app.replace('_', ' ').split('/') # returns ['app', '730', 'CounterStrike 2']
+
+            if int(appid) == STEAM_DECK_APPID:
+                continue
+
+            game_ids.append(Game(
+                appid=appid,
+                title=app_name
+            ))
+
+            if len(game_ids) >= num_games:
+                break
+
+        return game_ids
+
+    async def fetch(self, num_games: int) -> list[Game]:
+        # selenium is blocking, keep it off the event loop
+        return await asyncio.to_thread(self.format_app_ids, num_games)
+
+    async def aclose(self):
+        await asyncio.to_thread(self._pool.close)
+
+
+def get_top_sellers_source(name: str = TOP_SELLERS_SOURCE) -> TopSellersSource:
+    sources = {'http': HttpTopSellersSource, 'browser': BrowserTopSellersSource}
+    return sources[name]()
@@ -0,0 +1,23 @@
+import os
+
+# everything that differs between a dev box, prod and the offline benchmarks, read once from the environment
+
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_DB = os.environ.get('MONGO_DB', 'steam')
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+MIGRATE_ON_STARTUP = os.environ.get('MIGRATE_ON_STARTUP', '1') == '1' # set to 0 when `python migrations.py indexes` runs on deploy
+
+STEAM_STORE_URL = os.environ.get('STEAM_STORE_URL', 'https://store.steampowered.com').rstrip('/')
+STEAM_API_URL = os.environ.get('STEAM_API_URL', 'https://api.steampowered.com').rstrip('/')
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', 'page_cache') # raw store pages, empty to turn the cache off
+PAGE_CACHE_MAX_MB = int(os.environ.get('PAGE_CACHE_MAX_MB', 2048))
+RESCRAPE_PER_HOUR = int(os.environ.get('RESCRAPE_PER_HOUR', 0)) # store pages re-scraped per hour by the api, 0 is off
+RESCRAPE_MAX_AGE_HOURS = int(os.environ.get('RESCRAPE_MAX_AGE_HOURS', 24 * 7))
+SCRAPE_CONCURRENCY = int(os.environ.get('SCRAPE_CONCURRENCY', 8)) # store pages each api process scrapes at once
+SCRAPE_RATE = float(os.environ.get('SCRAPE_RATE', 4)) # store pages per second each api process scrapes at most
+TOP_SELLERS_SOURCE = os.environ.get('TOP_SELLERS_SOURCE', 'http') # or 'browser' to render the chart page in chrome
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_CALLS = int(os.environ.get('RATE_LIMIT_MAX_CALLS', 100))
+RATE_LIMIT_TIME_WINDOW = int(os.environ.get('RATE_LIMIT_TIME_WINDOW', 10))
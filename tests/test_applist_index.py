@@ -0,0 +1,22 @@
+import random
+
+from applist_index import AppListIndex
+
+
+def test_ranked_prefixes_match_a_full_scan():
+    rng = random.Random(7)
+    words = ['Ship', 'Shadow', 'Space', 'Sim', 'The', 'War']
+    apps = [(appid, ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4)))) for appid in range(2000)]
+    ranked = AppListIndex(apps, scan_limit=16)
+    scanned = AppListIndex(apps, scan_limit=len(apps))
+
+    for prefix in ['s', 'sh', 'ship ', 'ship sim', 'the war', 'x']:
+        for limit in (1, 10, 50):
+            assert ranked.prefix(prefix, limit) == scanned.prefix(prefix, limit)
+
+def test_shortest_titles_first():
+    index = AppListIndex([(1, 'Counter-Strike 2'), (2, 'Counter-Strike'), (3, 'Counter'), (4, 'Portal')])
+
+    assert index.prefix('COUNTER', 2) == [(3, 'Counter'), (2, 'Counter-Strike')]
+    assert index.title(4) == 'Portal'
+    assert index.title(5) is None
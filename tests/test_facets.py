@@ -0,0 +1,13 @@
+from facets import facet_deltas
+
+
+def test_new_game_counts_every_value_once():
+    game = {'tags': ['FPS', 'FPS', 'Action'], 'features': None, 'developers': {'developer': 'Valve', 'publisher': 'Valve'}}
+    assert facet_deltas(None, game) == {('tags', 'FPS'): 1, ('tags', 'Action'): 1,
+                                        ('developers', 'Valve'): 1, ('publishers', 'Valve'): 1}
+
+def test_changed_game_only_moves_what_changed():
+    old = {'tags': ['FPS', 'Action'], 'features': ['Co-op']}
+    new = {'tags': ['FPS', 'Shooter'], 'features': ['Co-op']}
+    assert +facet_deltas(old, new) == {('tags', 'Shooter'): 1}
+    assert -facet_deltas(old, new) == {('tags', 'Action'): 1}
@@ -0,0 +1,50 @@
+import random
+
+from scrapers.page_cache import PageCache
+
+
+def page(seed: int, size: int = 4000) -> str:
+    # random letters barely compress, so every page costs about the same on disk
+    rng = random.Random(seed)
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(size))
+
+
+def test_store_lookup_and_read(tmp_path):
+    cache = PageCache(tmp_path, max_bytes=10 ** 6)
+    stored = cache.store(730, page(1), etag='"abc"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+
+    cached = cache.lookup(730)
+    assert cached == stored
+    assert cached.validators == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert cache.read(cached) == page(1)
+    assert cache.lookup(570) is None
+
+    cache.revalidate(730) # a 304 counts as a fresh download
+    assert cache.lookup(730).fetched_at > stored.fetched_at
+
+def test_shared_pages_keep_their_blob_until_unreferenced(tmp_path):
+    cache = PageCache(tmp_path, max_bytes=10 ** 6)
+    shared = cache.store(1, page(1))
+    cache.store(2, page(1))
+    assert cache.stats()['blobs'] == 1
+
+    cache.store(1, page(2)) # app 2 still points at the old blob
+    assert cache.stats()['blobs'] == 2
+    assert cache.read(cache.lookup(2)) == page(1)
+
+    cache.store(2, page(2))
+    assert cache.stats()['blobs'] == 1
+    assert cache.read(shared) is None
+
+def test_eviction_stops_near_the_target(tmp_path):
+    cache = PageCache(tmp_path, max_bytes=50_000)
+    for appid in range(50):
+        cache.store(appid, page(appid))
+        cache.touch(appid) # strictly increasing used_at even on a coarse clock
+
+    stats = cache.stats()
+    page_size = stats['bytes'] / stats['pages']
+    assert stats['bytes'] <= 50_000
+    assert stats['bytes'] > 50_000 * 0.9 - 2 * page_size # one page past the target, not a whole batch
+    assert cache.lookup(49) is not None
+    assert cache.lookup(0) is None
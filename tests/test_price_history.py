@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from main import price_range
+from price_history import local_naive, merge_stats, period_stats, price_changes
+
+
+def test_price_changes_only_keeps_moved_prices():
+    assert price_changes({'Base': 10.0, 'Deluxe': 20.0}, {'Base': 10.0, 'Deluxe': 15.0, 'Gold': 30.0}) == {'Deluxe': 15.0, 'Gold': 30.0}
+    assert price_changes({'Base': 10.0}, {}) == {'Base': None}
+    assert price_changes({'Base': 10.0}, {'Base': 10.0}) == {}
+
+def test_daily_stats_follow_the_step_function():
+    points = [(datetime(2024, 1, 1, 12), 10.0), (datetime(2024, 1, 2, 6), 5.0), (datetime(2024, 1, 3), None)]
+    stats = period_stats(None, points, datetime(2024, 1, 1), datetime(2024, 1, 4), 'day')
+
+    assert stats == {
+        datetime(2024, 1, 1): {'min': 10.0, 'max': 10.0, 'avg': 10.0}, # nothing before noon, that half doesn't count
+        datetime(2024, 1, 2): {'min': 5.0, 'max': 10.0, 'avg': 6.25},
+    }
+
+def test_merge_stats_weighs_every_series_once():
+    day = datetime(2024, 1, 1)
+    merged = merge_stats([{day: {'min': 5.0, 'max': 10.0, 'avg': 8.0}}, {day: {'min': 20.0, 'max': 20.0, 'avg': 20.0}}])
+    assert merged == {day: {'min': 5.0, 'max': 20.0, 'avg': 14.0, 'series': 2}}
+
+def test_aware_range_bounds_become_local_naive():
+    moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert local_naive(moment) == moment.astimezone().replace(tzinfo=None)
+    assert local_naive(datetime(2024, 1, 1)) == datetime(2024, 1, 1)
+
+    start, end = price_range(datetime.now(timezone.utc) - timedelta(days=3), datetime.now(timezone.utc), 'day')
+    assert start.tzinfo is None and end.tzinfo is None
+    assert start < end
@@ -0,0 +1,9 @@
+from query_cache import QueryCache
+
+
+def test_regex_params_keep_their_case():
+    verbatim = ('title', 'description')
+
+    assert QueryCache.make_key(verbatim, title=r'\W') != QueryCache.make_key(verbatim, title=r'\w')
+    assert QueryCache.make_key(verbatim, tags=['FPS', 'Action']) == QueryCache.make_key(verbatim, tags=['action', 'fps'])
+    assert QueryCache.make_key(verbatim, title='Portal', appid=None) == QueryCache.make_key(verbatim, title='Portal')
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from scrapers import rescrape
+from scrapers.rescrape import priority, retry_delay
+
+WEEK = timedelta(days=7)
+
+
+def test_plain_game_due_after_max_age():
+    assert priority(timedelta(days=6), WEEK) < 1
+    assert priority(timedelta(days=7), WEEK) >= 1
+
+def test_top_sellers_and_requested_games_due_sooner():
+    age = timedelta(days=3)
+    assert priority(age, WEEK) < 1
+    assert priority(age, WEEK, rank=0) >= 1
+    assert priority(age, WEEK, rank=0) > priority(age, WEEK, rank=90)
+    assert priority(age, WEEK, hits=100) > priority(age, WEEK, hits=1)
+
+def test_failed_scrapes_back_off_up_to_max_age():
+    assert retry_delay(0, WEEK) == timedelta(minutes=15)
+    assert retry_delay(2, WEEK) == timedelta(hours=1)
+    assert retry_delay(1000, WEEK) == WEEK
+
+def test_demand_counter_is_capped(monkeypatch):
+    monkeypatch.setattr(rescrape, 'MAX_DEMAND_ENTRIES', 2)
+    monkeypatch.setattr(rescrape, 'demand', rescrape.Counter())
+    for appid in (1, 2, 3, 1):
+        rescrape.record_demand(appid)
+    assert rescrape.demand == {1: 2, 2: 1}
@@ -1,14 +1,25 @@
+import json
 from unittest.mock import Mock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
-from main import app, repository
+from main import app
+from mongo_db_processor import MongoRepository
 from schemas import Game, GameMetadata
 from middleware import RequestLimiter
 
 
 client = TestClient(app)
+repository = MongoRepository() # app's repository is async, tests poke the db synchronously
+
+
+@pytest.fixture(scope='module', autouse=True)
+def app_lifespan():
+    # motor binds to the first event loop it sees, so keep one portal (and loop) open for the whole module
+    with client:
+        yield
+
 
 def test_get_games():
     response = client.get('/games')
@@ -16,6 +27,34 @@ def test_get_games():
     assert response.json()[0].keys() == GameMetadata.model_fields.keys()
 
 
+def test_get_games_pagination():
+    first_page = client.get('/games', params={'limit': 1})
+    next_after = first_page.headers['X-Next-After']
+
+    second_page = client.get('/games', params={'limit': 1, 'after': next_after})
+
+    assert second_page.status_code == 200
+    assert second_page.json()[0]['appid'] > first_page.json()[0]['appid']
+
+def test_get_games_fields():
+    response = client.get('/games', params={'fields': 'title,min_price', 'limit': 5})
+
+    assert response.status_code == 200
+    assert all(game.keys() <= {'appid', 'title', 'min_price'} for game in response.json())
+    assert response.json()[0].keys() >= {'appid', 'title'}
+
+def test_get_games_unknown_field():
+    response = client.get('/games', params={'fields': 'title,password'})
+    assert response.status_code == 400
+
+def test_get_games_stream():
+    response = client.get('/games', params={'stream': True})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert json.loads(response.text.splitlines()[0]).keys() == GameMetadata.model_fields.keys()
+
+
 def test_add_existing_game():
     appid = 570 # dota 2 id
 
@@ -44,6 +83,18 @@ def test_add_duplicated_game():
     assert response.status_code == 409
     assert 'already in the lib' in response.json()['Msg']
 
+def test_add_games_batch():
+    stored = repository.find_first_game()['appid']
+    repository.delete_game(570)
+
+    response = client.post('/games/batch', json={'appids': [570, stored, 0, 570]})
+
+    assert response.status_code == 200
+    assert response.json()['results'] == {'570': 'added', str(stored): 'exists', '0': 'not_found'}
+    assert response.json()['counts']['added'] == 1
+
+    repository.delete_game(570)
+
 def test_get_top_games():
     response = client.get('/games/top_games', params={'num_games': 10})
 
@@ -103,12 +154,29 @@ def test_valid_search_multiple_params(params):
     assert response.status_code == 200
     assert target_app_id in appids
 
+def test_search_cache_hit():
+    client.get('/games/search', params={'tags': ['FPS', 'Shooter']})
+    hits = client.get('/games/search/cache').json()['hits']
+
+    response = client.get('/games/search', params={'tags': ['shooter', 'FPS']})
+
+    assert 730 in [game['appid'] for game in response.json()]
+    assert client.get('/games/search/cache').json()['hits'] == hits + 1
+
 def test_search_no_results():
     response = client.get('/games/search', params={'title': 'test'})
 
     assert response.status_code == 200
     assert response.json() == []
 
+def test_text_search():
+    response = client.get('/games/search/text', params={'q': 'counter strike', 'limit': 5})
+    games = response.json()
+
+    assert response.status_code == 200
+    assert 730 in [game['appid'] for game in games]
+    assert [game['score'] for game in games] == sorted([game['score'] for game in games], reverse=True)
+
 def test_search_invalid_appid():
     response = client.get('/games/search', params={'appid': 0})
 
@@ -122,8 +190,40 @@ def test_search_invalid_edition_range():
 def test_app_list():
     response = client.get('/games/applist')
 
+    counts = response.json()
+
+    assert response.status_code == 200
+    assert counts.keys() == {'added', 'updated', 'removed', 'unchanged'}
+    assert counts['added'] + counts['updated'] + counts['unchanged'] > 200_000
+
+def test_rate_limit_headers():
+    response = client.get('/games', params={'limit': 1})
+
+    assert response.headers['RateLimit-Limit'] == '100'
+    assert int(response.headers['RateLimit-Remaining']) < 100
+
+def test_app_title():
+    response = client.get('/apps/730')
+
+    assert response.status_code == 200
+    assert response.json() == {'appid': 730, 'title': 'Counter-Strike 2'}
+
+def test_app_prefix():
+    response = client.get('/apps', params={'prefix': 'counter-strike', 'limit': 5})
+    titles = [app['title'] for app in response.json()]
+
+    assert response.status_code == 200
+    assert 0 < len(titles) <= 5
+    assert all(title.lower().startswith('counter-strike') for title in titles)
+
+def test_metrics():
+    client.get('/apps/730')
+
+    response = client.get('/metrics')
+
     assert response.status_code == 200
-    assert len(response.json()) > 200_000
+    assert 'http_requests_total{method="GET",route="/apps/{appid}",status="200"}' in response.text
+    assert 'mongo_command_duration_seconds_count{collection="applist",command="find"}' in response.text
 
 #Yes, i'm aware that middleware is going to block any future tests after overwhelming it. idk how to change the max calls val or reset it
 def test_middleware():
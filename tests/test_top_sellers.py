@@ -0,0 +1,30 @@
+import asyncio
+
+from benchmarks.stub_steam import StubSteam
+from scrapers.http_client import close_http_client
+from scrapers.top_sellers import HttpTopSellersSource, STEAM_DECK_APPID
+
+
+def fetch_top_sellers(stub: StubSteam, num_games: int):
+
+    async def _fetch():
+        try:
+            return await HttpTopSellersSource(base_url=stub.url).fetch(num_games)
+        finally:
+            await close_http_client()
+
+    return asyncio.run(_fetch())
+
+
+def test_http_top_sellers_keeps_chart_order():
+    with StubSteam(catalog=range(1, 200), chart=[730, 570, 440]) as stub:
+        games = fetch_top_sellers(stub, 3)
+
+    assert [game.appid for game in games] == [730, 570, 440]
+    assert all(game.title for game in games)
+
+def test_http_top_sellers_skips_steam_deck():
+    with StubSteam(catalog=range(1, 200), chart=[730, STEAM_DECK_APPID, 570, 440]) as stub:
+        games = fetch_top_sellers(stub, 3)
+
+    assert [game.appid for game in games] == [730, 570, 440]